@@ -1,4 +1,6 @@
+from api import shopping_lists
 from api.models import Ingredient, Recipe, RecipeIngredient, RecipeTag, Tag
+from api.search import recipe_search
 from django.contrib import admin
 
 
@@ -18,6 +20,14 @@ class RecipeAdmin(admin.ModelAdmin):
     list_filter = ('name', 'author', 'tags',)
     empty_value_display = '-пусто-'
 
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        recipe_search.index_recipes([form.instance.pk])
+        if change:
+            shopping_lists.rebuild(list(
+                form.instance.in_cart.values_list('user', flat=True)
+            ))
+
 
 class IngredientAdmin(admin.ModelAdmin):
     list_display = ('name', 'measurement_unit',)
@@ -0,0 +1,172 @@
+import hashlib
+import time
+
+from api.renderers import FastJSONRenderer
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+
+class ReferenceDataCache:
+    """Cache for rarely changed tags and ingredients.
+
+    Every key includes version which is bumped by signals
+    when Tag or Ingredient is changed, so stale entries are never read.
+    Backend is chosen by REFERENCE_DATA_CACHE alias from CACHES setting.
+    """
+
+    version_key = 'reference_data:version'
+
+    @property
+    def cache(self):
+        return caches[settings.REFERENCE_DATA_CACHE]
+
+    def get_version(self):
+        """Return current version of reference data."""
+        version = self.cache.get(self.version_key)
+        if version is None:
+            self.cache.add(self.version_key, time.time_ns(), timeout=None)
+            version = self.cache.get(self.version_key)
+        return version
+
+    def bump_version(self):
+        """Make all cached reference data stale."""
+        try:
+            self.cache.incr(self.version_key)
+        except ValueError:
+            self.cache.set(self.version_key, time.time_ns(), timeout=None)
+
+    def get_etag(self, name):
+        """Return ETag for reference data resource."""
+        return f'"{name}-{self.get_version()}"'
+
+    def get_or_set(self, name, default):
+        """Return cached value for current version or set it
+        from `default` callable.
+        """
+        key = f'reference_data:{name}:{self.get_version()}'
+        value = self.cache.get(key)
+        if value is None:
+            value = default()
+            self.cache.set(
+                key, value, timeout=settings.REFERENCE_DATA_CACHE_TIMEOUT
+            )
+        return value
+
+    def get_json(self, name, get_data):
+        """Return rendered to JSON result of `get_data` callable."""
+        return self.get_or_set(
+            f'{name}:json', lambda: FastJSONRenderer().render(get_data())
+        )
+
+
+class RecipeResponseCache:
+    """Cache for recipe responses of anonymous users and user independent
+    recipe payloads.
+
+    Entry keeps versions of recipes, authors and tags it depends on,
+    signals bump these versions, so entry is stale once any of them
+    is changed. Backend is chosen by RECIPE_RESPONSE_CACHE alias.
+    """
+
+    prefix = 'recipe_response'
+
+    @property
+    def cache(self):
+        return caches[settings.RECIPE_RESPONSE_CACHE]
+
+    def get_key(self, request):
+        """Return key of response for URL with sorted query params."""
+        params = sorted(
+            (name, sorted(values))
+            for name, values in request.query_params.lists()
+        )
+        url = hashlib.md5(
+            f'{request.build_absolute_uri(request.path)}{params}'.encode()
+        ).hexdigest()
+        return f'{self.prefix}:{reference_data.get_version()}:{url}'
+
+    def get_payload_key(self, request, pk):
+        """Return key of recipe payload with URLs for requested host."""
+        host = hashlib.md5(request.build_absolute_uri('/').encode())
+        return (
+            f'{self.prefix}:{reference_data.get_version()}:'
+            f'{host.hexdigest()}:recipe:{pk}'
+        )
+
+    def get_versions(self, dependencies, add_missing=True):
+        """Return current versions of dependencies."""
+        keys = {
+            f'{self.prefix}:{dependency}': dependency
+            for dependency in dependencies
+        }
+        versions = self.cache.get_many(list(keys))
+        if add_missing:
+            missing = {
+                key: time.time_ns() for key in keys if key not in versions
+            }
+            self.cache.set_many(missing, timeout=None)
+            versions.update(missing)
+        return {keys[key]: version for key, version in versions.items()}
+
+    def get_many(self, keys):
+        """Return cached contents which dependencies are not changed."""
+        entries = self.cache.get_many(keys)
+        versions = self.get_versions(
+            set().union(*(
+                dependencies for _, dependencies in entries.values()
+            )),
+            add_missing=False
+        )
+        return {
+            key: content
+            for key, (content, dependencies) in entries.items()
+            if all(
+                versions.get(dependency) == version
+                for dependency, version in dependencies.items()
+            )
+        }
+
+    def get(self, key):
+        return self.get_many([key]).get(key)
+
+    def set_many(self, entries, versions):
+        """Cache contents with their dependencies from
+        `{key: (content, dependencies)}` dict.
+
+        `versions` of dependencies must be read by `get_versions` before
+        data of contents is read from database, so content built while
+        dependency is bumped is stored already stale. Entries with
+        dependencies missing from `versions` are not cached.
+        """
+        self.cache.set_many(
+            {
+                key: (content, {
+                    dependency: versions[dependency]
+                    for dependency in dependencies
+                })
+                for key, (content, dependencies) in entries.items()
+                if set(dependencies) <= versions.keys()
+            },
+            timeout=settings.RECIPE_RESPONSE_CACHE_TIMEOUT
+        )
+
+    def set(self, key, content, dependencies, versions):
+        self.set_many({key: (content, dependencies)}, versions)
+
+    def bump(self, *dependencies):
+        """Make stale all responses with given dependencies."""
+        for dependency in dependencies:
+            key = f'{self.prefix}:{dependency}'
+            try:
+                self.cache.incr(key)
+            except ValueError:
+                self.cache.set(key, time.time_ns(), timeout=None)
+
+    def invalidate(self, *dependencies):
+        """Bump dependencies after current transaction is committed."""
+        transaction.on_commit(lambda: self.bump(*dependencies))
+
+
+reference_data = ReferenceDataCache()
+recipe_responses = RecipeResponseCache()
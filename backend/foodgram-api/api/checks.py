@@ -0,0 +1,117 @@
+import multiprocessing
+
+from django.conf import settings
+from django.core.checks import Error, Warning, register
+
+LOCAL_CACHE_BACKEND = 'django.core.cache.backends.locmem.LocMemCache'
+SHARED_CACHES = (
+    'REFERENCE_DATA_CACHE', 'RECIPE_RESPONSE_CACHE', 'MEMBERSHIP_CACHE',
+    'RECIPE_INGREDIENT_INDEX_CACHE',
+)
+BOUNDED_CACHE_BACKENDS = (
+    LOCAL_CACHE_BACKEND,
+    'django.core.cache.backends.filebased.FileBasedCache',
+    'django.core.cache.backends.db.DatabaseCache',
+)
+DEFAULT_MAX_ENTRIES = 300
+
+
+def get_local_caches():
+    """Get names of settings of caches which must be shared by workers
+    but use local memory backend.
+    """
+    return [
+        name for name in SHARED_CACHES
+        if settings.CACHES[getattr(settings, name)]['BACKEND']
+        == LOCAL_CACHE_BACKEND
+    ]
+
+
+def get_workers():
+    """Get number of gunicorn workers, by default 2 * CPU + 1
+    or one worker when caches are not shared by processes.
+    """
+    if settings.GUNICORN_WORKERS > 0:
+        return settings.GUNICORN_WORKERS
+    if get_local_caches():
+        return 1
+    return multiprocessing.cpu_count() * 2 + 1
+
+
+def get_threads():
+    if settings.GUNICORN_WORKER_CLASS == 'gthread':
+        return settings.GUNICORN_THREADS
+    return 1
+
+
+@register('runtime', deploy=True)
+def check_runtime(app_configs, **kwargs):
+    """Check that settings are safe for gunicorn workers and threads."""
+    errors = []
+    database = settings.DATABASES['default']
+    workers, threads = get_workers(), get_threads()
+    if settings.DB_POOL_MODE not in settings.DB_POOL_MODES:
+        errors.append(Error(
+            f'Unknown DB_POOL_MODE {settings.DB_POOL_MODE!r}.',
+            hint=f'Use one of {", ".join(settings.DB_POOL_MODES)}.',
+            id='api.E001',
+        ))
+    local_caches = get_local_caches()
+    if workers > 1 and local_caches:
+        errors.append(Error(
+            f'{", ".join(local_caches)} use local memory cache, '
+            f'but {workers} workers are configured.',
+            hint='Every worker would invalidate only its own cache, '
+                 'use memcached or redis backend or one worker.',
+            id='api.E002',
+        ))
+    index_cache = settings.CACHES[settings.RECIPE_INGREDIENT_INDEX_CACHE]
+    max_entries = index_cache.get('OPTIONS', {}).get(
+        'MAX_ENTRIES', DEFAULT_MAX_ENTRIES
+    )
+    if (
+        index_cache['BACKEND'] in BOUNDED_CACHE_BACKENDS
+        and max_entries <= settings.RECIPE_INGREDIENT_INDEX_JOURNAL + 1
+    ):
+        errors.append(Error(
+            f'RECIPE_INGREDIENT_INDEX_CACHE keeps {max_entries} entries, '
+            f'not more than RECIPE_INGREDIENT_INDEX_JOURNAL='
+            f'{settings.RECIPE_INGREDIENT_INDEX_JOURNAL} changes and version.',
+            hint='Evicted version or changes make every process reload '
+                 'whole index, raise MAX_ENTRIES in OPTIONS of its alias.',
+            id='api.E004',
+        ))
+    if 'postgresql' in database['ENGINE']:
+        connections = workers * (threads + settings.IMAGE_WORKERS)
+        if (
+            settings.DB_POOL_MODE == 'persistent'
+            and connections > settings.DB_MAX_CONNECTIONS
+        ):
+            errors.append(Error(
+                f'{workers} workers with {threads} threads and '
+                f'{settings.IMAGE_WORKERS} image workers may open '
+                f'{connections} connections, more than '
+                f'DB_MAX_CONNECTIONS={settings.DB_MAX_CONNECTIONS}.',
+                hint='Reduce GUNICORN_WORKERS or GUNICORN_THREADS '
+                     'or use DB_POOL_MODE=pgbouncer.',
+                id='api.E003',
+            ))
+        if not database['CONN_MAX_AGE']:
+            errors.append(Warning(
+                'DB_CONN_MAX_AGE=0 opens new connection for every request.',
+                id='api.W001',
+            ))
+    elif threads * workers > 1:
+        errors.append(Warning(
+            f'{database["ENGINE"]} is used by {workers} workers '
+            f'with {threads} threads.',
+            hint='Concurrent writes to SQLite wait for each other, '
+                 'use PostgreSQL in production.',
+            id='api.W002',
+        ))
+    if settings.DEBUG and threads * workers > 1:
+        errors.append(Warning(
+            'DEBUG keeps queries of requests in memory of every thread.',
+            id='api.W003',
+        ))
+    return errors
@@ -0,0 +1,38 @@
+import time
+
+from django.conf import settings
+from django.core.signals import request_finished, request_started
+from django.db import connections
+from django.dispatch import receiver
+
+
+@receiver(request_started)
+def check_connections(**kwargs):
+    """Close persistent connections which broke while idle,
+    like CONN_HEALTH_CHECKS of newer Django versions.
+
+    Connection is checked only if it was idle longer than
+    DB_HEALTH_CHECK_IDLE seconds, so busy workers do not ping database
+    before every request.
+    """
+    now = time.monotonic()
+    for connection in connections.all():
+        if (
+            connection.connection is None
+            or not connection.settings_dict.get('CONN_HEALTH_CHECKS')
+        ):
+            continue
+        idle = now - getattr(connection, 'last_request_finished', now)
+        if idle > settings.DB_HEALTH_CHECK_IDLE and not (
+            connection.is_usable()
+        ):
+            connection.close()
+
+
+@receiver(request_finished)
+def mark_connections(**kwargs):
+    """Remember when connections were used by request last time."""
+    now = time.monotonic()
+    for connection in connections.all():
+        if connection.connection is not None:
+            connection.last_request_finished = now
@@ -1,6 +1,5 @@
-import base64
-
-from django.core.files.base import ContentFile
+from api.images import decode_base64_image
+from django.conf import settings
 from rest_framework import serializers
 
 
@@ -9,7 +8,41 @@ class Base64ImageField(serializers.ImageField):
 
     def to_internal_value(self, data):
         if isinstance(data, str) and data.startswith('data:image'):
-            format, imgstr = data.split(';base64,')
-            ext = format.split('/')[-1]
-            data = ContentFile(base64.b64decode(imgstr), name='temp.' + ext)
+            _, imgstr = data.split(';base64,')
+            try:
+                data = decode_base64_image(imgstr)
+            except ValueError as error:
+                raise serializers.ValidationError(str(error))
         return super().to_internal_value(data)
+
+
+def get_image_variant_urls(name, variants, storage, request=None):
+    """Get URLs of resized variants of image.
+
+    Until variants are made URLs point to original image.
+    """
+    if variants.get('source') != name:
+        variants = {}
+    urls = {}
+    for variant in settings.IMAGE_VARIANTS:
+        url = storage.url(variants.get(variant, name))
+        urls[variant] = request.build_absolute_uri(url) if request else url
+    return urls
+
+
+class ImageVariantsField(serializers.ReadOnlyField):
+    """Field with URLs of resized variants of recipe image."""
+
+    def __init__(self, **kwargs):
+        kwargs['source'] = '*'
+        super().__init__(**kwargs)
+
+    def to_representation(self, recipe):
+        if not recipe.image:
+            return None
+        return get_image_variant_urls(
+            recipe.image.name,
+            recipe.image_variants,
+            recipe.image.storage,
+            self.context.get('request')
+        )
@@ -1,38 +1,78 @@
-from api.models import Recipe
+from api.memberships import memberships
+from api.models import Recipe, RecipeTag
+from api.search import ingredient_index, recipe_search
 from django_filters.rest_framework import BooleanFilter, CharFilter, FilterSet
-from rest_framework.filters import SearchFilter
+from rest_framework.filters import BaseFilterBackend
 
 
-class IngredientSearchFilter(SearchFilter):
-    """Custom search filter for Ingredient model."""
+class IngredientSearchFilter(BaseFilterBackend):
+    """Custom search filter for Ingredient model.
+
+    Uses in-process index, prefix matches go first, contains matches after
+    them, number of results is capped by `limit` query param.
+    """
 
     search_param = 'name'
+    limit_param = 'limit'
+    default_limit = 50
+    max_limit = 1000
+
+    def get_limit(self, request):
+        try:
+            limit = int(request.query_params[self.limit_param])
+        except (KeyError, ValueError):
+            return self.default_limit
+        return min(max(limit, 1), self.max_limit)
+
+    def filter_queryset(self, request, queryset, view):
+        name = request.query_params.get(self.search_param, '').strip()
+        if not name or getattr(view, 'action', None) != 'list':
+            return queryset
+        return ingredient_index.search(name, self.get_limit(request))
 
 
 class RecipeFilter(FilterSet):
-    """Custom filter for Recipe model."""
+    """Custom filter for Recipe model.
+
+    `search` finds recipes by words of name, ingredients and text
+    using full-text index and orders them by relevance.
+    """
 
     author = CharFilter(field_name='author_id')
     tags = CharFilter(method='get_tags')
     is_favorited = BooleanFilter(method='get_boolean_fields')
     is_in_shopping_cart = BooleanFilter(method='get_boolean_fields')
+    search = CharFilter(method='get_search')
 
     class Meta:
         model = Recipe
-        fields = ('tags', 'is_favorited', 'is_in_shopping_cart', 'author',)
+        fields = (
+            'tags', 'is_favorited', 'is_in_shopping_cart', 'author', 'search',
+        )
 
     def get_boolean_fields(self, queryset, name, value):
         user = self.request.user
         if value:
+            if not user.is_authenticated:
+                return queryset.none()
             if name == 'is_favorited':
-                return queryset.filter(in_favorites__user=user)
+                return queryset.filter(
+                    pk__in=memberships.get_ids(user, 'favorites')
+                )
             if name == 'is_in_shopping_cart':
-                return queryset.filter(in_cart__user=user)
+                return queryset.filter(
+                    pk__in=memberships.get_ids(user, 'shopping_cart')
+                )
         return queryset
 
     def get_tags(self, queryset, field_name, value):
         if value:
             return queryset.filter(
-                tags__slug__in=self.request.query_params.getlist('tags')
-            ).distinct()
+                pk__in=RecipeTag.objects.filter(
+                    tags__slug__in=self.request.query_params.getlist('tags')
+                ).values('recipe')
+            )
         return queryset
+
+    def get_search(self, queryset, name, value):
+        return recipe_search.filter(queryset, value)
@@ -0,0 +1,144 @@
+import base64
+import binascii
+import hashlib
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from tempfile import SpooledTemporaryFile
+from threading import Lock
+
+from api.cache import recipe_responses
+from django.conf import settings
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.db import connection, transaction
+from PIL import Image
+
+DECODE_CHUNK_SIZE = 64 * 1024
+
+logger = logging.getLogger(__name__)
+
+executor = ThreadPoolExecutor(
+    max_workers=settings.IMAGE_WORKERS, thread_name_prefix='images'
+)
+scheduled = set()
+scheduled_lock = Lock()
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """Storage which keeps one file for one name.
+
+    Names are hashes of content, so existing file is the same image
+    and is reused instead of saving copy with random suffix.
+    """
+
+    def save(self, name, content, max_length=None):
+        if name is not None and self.exists(name):
+            return name
+        return super().save(name, content, max_length)
+
+
+def decode_base64_image(data):
+    """Decode base64 image chunk by chunk into named by hash file.
+
+    Line breaks and other whitespace of wrapped base64 are removed first,
+    so every chunk is whole groups of 4 characters, other characters
+    not from base64 alphabet are errors. Size and pixel limits are checked
+    before image is fully loaded.
+    """
+    data = ''.join(data.split())
+    padding = len(data) - len(data.rstrip('='))
+    if len(data) * 3 // 4 - padding > settings.IMAGE_MAX_SIZE:
+        raise ValueError('Изображение слишком большое.')
+    digest = hashlib.sha256()
+    file = SpooledTemporaryFile(max_size=DECODE_CHUNK_SIZE * 16)
+    try:
+        for start in range(0, len(data), DECODE_CHUNK_SIZE):
+            chunk = base64.b64decode(
+                data[start:start + DECODE_CHUNK_SIZE], validate=True
+            )
+            digest.update(chunk)
+            file.write(chunk)
+        file.seek(0)
+        with Image.open(file) as image:
+            width, height = image.size
+            image_format = image.format
+    except Image.DecompressionBombError as error:
+        file.close()
+        raise ValueError(
+            'Слишком большое разрешение изображения.'
+        ) from error
+    except (binascii.Error, OSError) as error:
+        file.close()
+        raise ValueError('Некорректное изображение.') from error
+    if width * height > settings.IMAGE_MAX_PIXELS:
+        file.close()
+        raise ValueError('Слишком большое разрешение изображения.')
+    file.seek(0)
+    return File(file, name=f'{digest.hexdigest()}.{image_format.lower()}')
+
+
+def get_variant_name(name, variant):
+    """Get storage name of resized variant of image."""
+    root, _ = os.path.splitext(name)
+    extension = settings.IMAGE_VARIANT_FORMAT.lower()
+    return f'{root}_{variant}.{extension}'
+
+
+def make_variants(name):
+    """Save resized variants of image and mark recipes with this image.
+
+    Runs in worker pool, which keeps exceptions in futures nobody reads,
+    so failures are logged here, recipes keep showing source image.
+    Returns whether variants were made.
+    """
+    from api.models import Recipe
+    storage = Recipe._meta.get_field('image').storage
+    try:
+        variants = {'source': name}
+        with storage.open(name) as file, Image.open(file) as image:
+            image = image.convert('RGB')
+            for variant, size in settings.IMAGE_VARIANTS.items():
+                resized = image.copy()
+                resized.thumbnail((size, size))
+                content = BytesIO()
+                resized.save(
+                    content,
+                    settings.IMAGE_VARIANT_FORMAT,
+                    quality=settings.IMAGE_VARIANT_QUALITY
+                )
+                variants[variant] = storage.save(
+                    get_variant_name(name, variant),
+                    ContentFile(content.getvalue())
+                )
+        recipes = Recipe.objects.filter(image=name)
+        ids = list(recipes.values_list('pk', flat=True))
+        recipes.update(image_variants=variants)
+        recipe_responses.bump(*(f'recipe:{pk}' for pk in ids))
+    except Exception:
+        logger.exception('Не удалось сделать варианты изображения %s.', name)
+        return False
+    finally:
+        with scheduled_lock:
+            scheduled.discard(name)
+        connection.close()
+    return True
+
+
+def submit_variants(name):
+    """Submit image to worker pool unless it is already there."""
+    with scheduled_lock:
+        if name in scheduled:
+            return
+        scheduled.add(name)
+    executor.submit(make_variants, name)
+
+
+def schedule_variants(recipe):
+    """Make variants of recipe image in background after commit."""
+    name = recipe.image.name
+    if not name or recipe.image_variants.get('source') == name:
+        return
+    transaction.on_commit(lambda: submit_variants(name))
@@ -0,0 +1,429 @@
+import base64
+import statistics
+import time
+import tracemalloc
+from io import BytesIO
+
+from api.models import Ingredient, Recipe, RecipeInShoppingCart, Tag
+from api.queries import RepeatedQueryError
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext, override_settings
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Request every endpoint of api and users applications through '
+        'test client and report p50/p99 latency, queries and allocated '
+        'memory per request. Changed data is restored after every run, '
+        'statements repeated by request fail benchmark.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=50,
+            help='number of measured runs of every endpoint',
+        )
+        parser.add_argument(
+            '--warmup',
+            type=int,
+            default=3,
+            help='number of not measured runs of every endpoint',
+        )
+        parser.add_argument(
+            '--email',
+            help='email of user for authenticated requests, '
+                 'by default user with the largest shopping cart',
+        )
+        parser.add_argument(
+            '--password',
+            help='password of user to benchmark login and logout',
+        )
+        parser.add_argument(
+            '--only',
+            help='run only endpoints which name contains this string',
+        )
+
+    def get_user(self, email):
+        if email is not None:
+            user = User.objects.filter(email=email).first()
+        else:
+            user = User.objects.annotate(
+                cart=Count('recipes_in_cart')
+            ).order_by('-cart').first()
+        if user is None:
+            raise CommandError('Пользователь не найден.')
+        return user
+
+    def get_image(self):
+        content = BytesIO()
+        Image.new('RGB', (64, 64), (200, 100, 50)).save(content, 'PNG')
+        return (
+            'data:image/png;base64,'
+            + base64.b64encode(content.getvalue()).decode()
+        )
+
+    def get_client(self, token=None):
+        client = APIClient()
+        if token is not None:
+            client.credentials(HTTP_AUTHORIZATION=f'Token {token}')
+        return client
+
+    def get_scenarios(self, user, password):
+        """Scenarios of requests, every scenario leaves data unchanged.
+
+        Request is `(name, client, method, url, data)`, client and url
+        may be callables getting response to the first request
+        of scenario.
+        """
+        anon = self.get_client()
+        auth = self.get_client(Token.objects.get_or_create(user=user)[0].key)
+        recipe = Recipe.objects.exclude(author=user).exclude(
+            in_favorites__user=user
+        ).exclude(in_cart__user=user).order_by('-favorites_count').first()
+        recipes = list(Recipe.objects.exclude(in_favorites__user=user).exclude(
+            in_cart__user=user
+        ).values_list('pk', flat=True)[:100])
+        author = User.objects.exclude(pk=user.pk).exclude(
+            following__user=user
+        ).order_by('-recipes_count').first()
+        authors = list(User.objects.exclude(pk=user.pk).exclude(
+            following__user=user
+        ).values_list('pk', flat=True)[:100])
+        tags = list(Tag.objects.values_list('pk', 'slug')[:3])
+        ingredient = Ingredient.objects.first()
+        if not (recipe and author and tags and ingredient):
+            raise CommandError(
+                'Мало данных для проверки, выполните generate_data.'
+            )
+        recipe_data = {
+            'ingredients': [{'id': ingredient.pk, 'amount': 10}],
+            'tags': [pk for pk, _ in tags],
+            'image': self.get_image(),
+            'name': 'Проверка',
+            'text': 'Проверка',
+            'cooking_time': 10,
+        }
+        slugs = '&'.join(f'tags={slug}' for _, slug in tags)
+        scenarios = [
+            [('GET tags', anon, 'get', '/api/tags/', None)],
+            [('GET tag', anon, 'get', f'/api/tags/{tags[0][0]}/', None)],
+            [('GET ingredients', anon, 'get', '/api/ingredients/', None)],
+            [(
+                'GET ingredients search',
+                anon,
+                'get',
+                f'/api/ingredients/?name={ingredient.name[:2]}',
+                None
+            )],
+            [(
+                'GET ingredient',
+                anon,
+                'get',
+                f'/api/ingredients/{ingredient.pk}/',
+                None
+            )],
+            [('GET recipes anon', anon, 'get', '/api/recipes/', None)],
+            [('GET recipes', auth, 'get', '/api/recipes/', None)],
+            [(
+                'GET recipes cook',
+                auth,
+                'get',
+                f'/api/recipes/cook/?ingredients={ingredient.pk}',
+                None
+            )],
+            [(
+                'GET recipes search',
+                auth,
+                'get',
+                f'/api/recipes/?search={ingredient.name.split()[0]}',
+                None
+            )],
+            [(
+                'GET recipes by tags',
+                auth,
+                'get',
+                f'/api/recipes/?{slugs}',
+                None
+            )],
+            [(
+                'GET recipes favorited',
+                auth,
+                'get',
+                '/api/recipes/?is_favorited=1',
+                None
+            )],
+            [(
+                'GET recipes in cart',
+                auth,
+                'get',
+                '/api/recipes/?is_in_shopping_cart=1',
+                None
+            )],
+            [(
+                'GET recipes by author',
+                auth,
+                'get',
+                f'/api/recipes/?author={author.pk}',
+                None
+            )],
+            [(
+                'GET recipe anon',
+                anon,
+                'get',
+                f'/api/recipes/{recipe.pk}/',
+                None
+            )],
+            [('GET recipe', auth, 'get', f'/api/recipes/{recipe.pk}/', None)],
+            [(
+                'GET download_shopping_cart',
+                auth,
+                'get',
+                '/api/recipes/download_shopping_cart/?format=txt',
+                None
+            )],
+            [
+                ('POST recipe', auth, 'post', '/api/recipes/', recipe_data),
+                (
+                    'PATCH recipe',
+                    auth,
+                    'patch',
+                    lambda response: f'/api/recipes/{response.data["id"]}/',
+                    recipe_data
+                ),
+                (
+                    'DELETE recipe',
+                    auth,
+                    'delete',
+                    lambda response: f'/api/recipes/{response.data["id"]}/',
+                    None
+                ),
+            ],
+            [
+                (
+                    'POST favorite',
+                    auth,
+                    'post',
+                    f'/api/recipes/{recipe.pk}/favorite/',
+                    None
+                ),
+                (
+                    'DELETE favorite',
+                    auth,
+                    'delete',
+                    f'/api/recipes/{recipe.pk}/favorite/',
+                    None
+                ),
+            ],
+            [
+                (
+                    'POST shopping_cart',
+                    auth,
+                    'post',
+                    f'/api/recipes/{recipe.pk}/shopping_cart/',
+                    None
+                ),
+                (
+                    'DELETE shopping_cart',
+                    auth,
+                    'delete',
+                    f'/api/recipes/{recipe.pk}/shopping_cart/',
+                    None
+                ),
+            ],
+            [
+                (
+                    'POST favorite batch',
+                    auth,
+                    'post',
+                    '/api/recipes/favorite/',
+                    {'ids': recipes}
+                ),
+                (
+                    'DELETE favorite batch',
+                    auth,
+                    'delete',
+                    '/api/recipes/favorite/',
+                    {'ids': recipes}
+                ),
+            ],
+            [
+                (
+                    'POST shopping_cart batch',
+                    auth,
+                    'post',
+                    '/api/recipes/shopping_cart/',
+                    {'ids': recipes}
+                ),
+                (
+                    'DELETE shopping_cart batch',
+                    auth,
+                    'delete',
+                    '/api/recipes/shopping_cart/',
+                    {'ids': recipes}
+                ),
+            ],
+            [('GET users', anon, 'get', '/api/users/', None)],
+            [('GET user', auth, 'get', f'/api/users/{author.pk}/', None)],
+            [('GET users me', auth, 'get', '/api/users/me/', None)],
+            [(
+                'GET subscriptions',
+                auth,
+                'get',
+                '/api/users/subscriptions/?recipes_limit=3',
+                None
+            )],
+            [
+                (
+                    'POST subscribe',
+                    auth,
+                    'post',
+                    f'/api/users/{author.pk}/subscribe/',
+                    None
+                ),
+                (
+                    'DELETE subscribe',
+                    auth,
+                    'delete',
+                    f'/api/users/{author.pk}/subscribe/',
+                    None
+                ),
+            ],
+            [
+                (
+                    'POST subscribe batch',
+                    auth,
+                    'post',
+                    '/api/users/subscribe/',
+                    {'ids': authors}
+                ),
+                (
+                    'DELETE subscribe batch',
+                    auth,
+                    'delete',
+                    '/api/users/subscribe/',
+                    {'ids': authors}
+                ),
+            ],
+        ]
+        if password is not None:
+            scenarios.append([
+                (
+                    'POST token login',
+                    anon,
+                    'post',
+                    '/api/auth/token/login/',
+                    {'email': user.email, 'password': password}
+                ),
+                (
+                    'POST token logout',
+                    lambda response: self.get_client(
+                        response.data['auth_token']
+                    ),
+                    'post',
+                    '/api/auth/token/logout/',
+                    None
+                ),
+            ])
+        return scenarios
+
+    def request(self, client, method, url, data, first_response):
+        if callable(client):
+            client = client(first_response)
+        if callable(url):
+            url = url(first_response)
+        response = getattr(client, method)(url, data, format='json')
+        if response.streaming:
+            b''.join(response.streaming_content)
+        if response.status_code >= 400:
+            raise CommandError(
+                f'{method.upper()} {url}: {response.status_code} '
+                f'{response.content[:200]}'
+            )
+        return response
+
+    def run(self, scenario, results=None, measure=None):
+        """Run scenario once and add measurements of its requests."""
+        first_response = None
+        for name, client, method, url, data in scenario:
+            if measure is None:
+                response = self.request(
+                    client, method, url, data, first_response
+                )
+            else:
+                response, value = measure(
+                    self.request, client, method, url, data, first_response
+                )
+                results.setdefault(name, []).append(value)
+            if first_response is None:
+                first_response = response
+
+    def measure_time(self, function, *args):
+        started = time.perf_counter()
+        response = function(*args)
+        return response, (time.perf_counter() - started) * 1000
+
+    def measure_queries(self, function, *args):
+        """Count queries, repeated statements fail benchmark."""
+        try:
+            with override_settings(
+                NPLUSONE_RAISE=True
+            ), CaptureQueriesContext(connection) as context:
+                response = function(*args)
+        except RepeatedQueryError as error:
+            raise CommandError(error) from error
+        return response, len(context.captured_queries)
+
+    def measure_memory(self, function, *args):
+        tracemalloc.start()
+        try:
+            response = function(*args)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        return response, peak / 1024
+
+    def handle(self, **options):
+        if options['repeat'] < 2:
+            raise CommandError('Нужно хотя бы два измерения.')
+        settings.ALLOWED_HOSTS.append('testserver')
+        user = self.get_user(options['email'])
+        scenarios = [
+            scenario
+            for scenario in self.get_scenarios(user, options['password'])
+            if options['only'] is None or any(
+                options['only'] in request[0] for request in scenario
+            )
+        ]
+        timings, queries, memory = {}, {}, {}
+        for scenario in scenarios:
+            for _ in range(options['warmup']):
+                self.run(scenario)
+            self.run(scenario, queries, self.measure_queries)
+            self.run(scenario, memory, self.measure_memory)
+            for _ in range(options['repeat']):
+                self.run(scenario, timings, self.measure_time)
+        self.stdout.write(
+            f'Рецептов: {Recipe.objects.count()}, '
+            f'пользователей: {User.objects.count()}, '
+            f'в корзинах: {RecipeInShoppingCart.objects.count()}'
+        )
+        self.stdout.write(
+            f'{"endpoint":<28}  {"p50, мс":>8}  {"p99, мс":>8}  '
+            f'{"запросов":>8}  {"память, КиБ":>11}'
+        )
+        for name, values in timings.items():
+            p99 = statistics.quantiles(values, n=100)[-1]
+            self.stdout.write(
+                f'{name:<28}  {statistics.median(values):>8.2f}  '
+                f'{p99:>8.2f}  {queries[name][0]:>8}  '
+                f'{memory[name][0]:>11.1f}'
+            )
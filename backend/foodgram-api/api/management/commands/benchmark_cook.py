@@ -0,0 +1,102 @@
+import statistics
+import time
+
+from api.models import Recipe, RecipeIngredient
+from api.search import recipe_ingredient_index
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count, F, FloatField, Q
+from django.db.models.functions import Cast
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare latency of search of recipes by available ingredients '
+        'with aggregation over RecipeIngredient and with inverted index.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--ingredients',
+            type=int,
+            nargs='+',
+            default=[3, 10, 30],
+            help='numbers of available most used ingredients',
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=6,
+            help='number of found recipes',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=20,
+            help='number of runs for every measurement',
+        )
+
+    def find_by_join(self, ingredient_ids, limit):
+        """Count coverage of every recipe by GROUP BY."""
+        recipes = RecipeIngredient.objects.order_by().values(
+            'recipe'
+        ).annotate(
+            total=Count('id'),
+            matched=Count('id', filter=Q(ingredients__in=ingredient_ids)),
+        ).filter(matched__gt=0)
+        found = recipes.annotate(
+            coverage=Cast('matched', FloatField()) / F('total')
+        ).order_by('-coverage', '-matched', '-recipe_id').values_list(
+            'coverage', 'matched', 'recipe'
+        )[:limit]
+        return recipes.count(), list(found)
+
+    def find_by_index(self, ingredient_ids, limit):
+        return recipe_ingredient_index.find(ingredient_ids, limit)
+
+    def measure(self, function, ingredient_ids, limit, repeat):
+        """Get median latency of function in milliseconds."""
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            function(ingredient_ids, limit)
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
+
+    def handle(self, **options):
+        ingredient_ids = list(
+            RecipeIngredient.objects.order_by().values('ingredients').annotate(
+                recipes=Count('id')
+            ).order_by('-recipes').values_list('ingredients', flat=True)[
+                :max(options['ingredients'])
+            ]
+        )
+        if not ingredient_ids:
+            raise CommandError('Нет ингредиентов рецептов для проверки.')
+        recipe_ingredient_index.reset()
+        started = time.perf_counter()
+        recipe_ingredient_index.get_index()
+        self.stdout.write(
+            f'Рецептов: {Recipe.objects.count()}, загрузка индекса: '
+            f'{(time.perf_counter() - started) * 1000:.0f} мс'
+        )
+        self.stdout.write('ингредиентов  найдено  GROUP BY, мс  индекс, мс')
+        for ingredients_count in options['ingredients']:
+            selected = ingredient_ids[:ingredients_count]
+            count, found = self.find_by_index(selected, options['limit'])
+            if (count, found) != self.find_by_join(selected, options['limit']):
+                raise CommandError(
+                    f'Результаты для {ingredients_count} ингредиентов '
+                    'не совпадают.'
+                )
+            join = self.measure(
+                self.find_by_join, selected, options['limit'],
+                options['repeat']
+            )
+            index = self.measure(
+                self.find_by_index, selected, options['limit'],
+                options['repeat']
+            )
+            self.stdout.write(
+                f'{len(selected):>12}  {count:>7}  {join:>12.2f}  '
+                f'{index:>10.2f}'
+            )
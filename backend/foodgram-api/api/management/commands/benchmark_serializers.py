@@ -0,0 +1,123 @@
+import statistics
+import time
+
+from api.models import Ingredient, Recipe, RecipeIngredient
+from api.renderers import FastJSONRenderer
+from api.representations import represent, represent_recipes
+from api.serializers import GetRecipeSerializer, IngredientSrializer
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Prefetch
+from django.test import RequestFactory
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare latency of DRF serializers with JSONRenderer and lean '
+        'representations with FastJSONRenderer on current database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--page_sizes',
+            type=int,
+            nargs='+',
+            default=[6, 100, 1000],
+            help='numbers of recipes on page',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=20,
+            help='number of runs for every measurement',
+        )
+
+    def get_request(self):
+        request = Request(
+            RequestFactory(SERVER_NAME='localhost').get('/api/recipes/')
+        )
+        request.user = AnonymousUser()
+        return request
+
+    def render_serializer(self, ids):
+        """Render recipes by GetRecipeSerializer as before."""
+        recipes = Recipe.objects.filter(pk__in=ids).prefetch_related(
+            'author',
+            'tags',
+            Prefetch(
+                'recipe_ingredients',
+                queryset=RecipeIngredient.objects.select_related(
+                    'ingredients'
+                )
+            ),
+        )
+        return JSONRenderer().render(GetRecipeSerializer(
+            recipes, many=True, context={'request': self.get_request()}
+        ).data)
+
+    def render_representation(self, ids):
+        """Render recipes by represent_recipes."""
+        recipes = represent_recipes(ids, self.get_request())
+        return FastJSONRenderer().render([
+            recipes[pk]
+            for pk in Recipe.objects.filter(pk__in=ids).values_list(
+                'pk', flat=True
+            )
+        ])
+
+    def render_ingredients_serializer(self, _):
+        return JSONRenderer().render(
+            IngredientSrializer(Ingredient.objects.all(), many=True).data
+        )
+
+    def render_ingredients_representation(self, _):
+        return FastJSONRenderer().render(represent(
+            Ingredient.objects.all(), IngredientSrializer.Meta.fields
+        ))
+
+    def measure(self, function, ids, repeat):
+        """Get median latency of function in milliseconds."""
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            function(ids)
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
+
+    def compare(self, title, serializer, representation, ids, repeat):
+        if serializer(ids) != representation(ids):
+            raise CommandError(f'{title}: результаты не совпадают.')
+        before = self.measure(serializer, ids, repeat)
+        after = self.measure(representation, ids, repeat)
+        self.stdout.write(
+            f'{title:>13}  {before:>15.2f}  {after:>8.2f}  '
+            f'{before / after:>8.1f}x'
+        )
+
+    def handle(self, **options):
+        if not Recipe.objects.exists():
+            raise CommandError('Нет рецептов для проверки.')
+        self.stdout.write(
+            f'{"страница":>13}  {"serializers, мс":>15}  {"lean, мс":>8}  '
+            f'{"ускорение":>9}'
+        )
+        for page_size in options['page_sizes']:
+            ids = list(
+                Recipe.objects.values_list('pk', flat=True)[:page_size]
+            )
+            self.compare(
+                f'{len(ids)} рецептов',
+                self.render_serializer,
+                self.render_representation,
+                ids,
+                options['repeat']
+            )
+        self.compare(
+            'ингредиенты',
+            self.render_ingredients_serializer,
+            self.render_ingredients_representation,
+            None,
+            options['repeat']
+        )
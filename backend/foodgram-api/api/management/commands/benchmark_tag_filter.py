@@ -0,0 +1,90 @@
+import statistics
+import time
+
+from api.filters import RecipeFilter
+from api.models import Recipe, Tag
+from api.paginations import StandardResultsSetPagination
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from django.test import RequestFactory
+from rest_framework.request import Request
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare latency of DISTINCT join and semi-join tag filters '
+        'of recipe list on current database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tags',
+            type=int,
+            nargs='+',
+            default=[1, 3, 6],
+            help='numbers of selected tags',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=20,
+            help='number of runs for every measurement',
+        )
+
+    def get_distinct_page(self, slugs):
+        """First page and count with join and DISTINCT."""
+        queryset = Recipe.objects.filter(tags__slug__in=slugs).distinct()
+        return queryset.count(), list(
+            queryset[:StandardResultsSetPagination.page_size]
+        )
+
+    def get_semi_join_page(self, slugs):
+        """First page and count with RecipeFilter."""
+        request = Request(RequestFactory().get(
+            '/api/recipes/', {'tags': slugs}
+        ))
+        queryset = RecipeFilter(
+            request.query_params,
+            queryset=Recipe.objects.all(),
+            request=request
+        ).qs
+        return queryset.count(), list(
+            queryset[:StandardResultsSetPagination.page_size]
+        )
+
+    def measure(self, function, slugs, repeat):
+        """Get median latency of function in milliseconds."""
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            function(slugs)
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
+
+    def handle(self, **options):
+        slugs = list(
+            Tag.objects.annotate(
+                recipes_count=Count('recipetag')
+            ).order_by('-recipes_count').values_list('slug', flat=True)
+        )
+        if not slugs:
+            raise CommandError('Нет тегов для проверки.')
+        self.stdout.write(f'Рецептов: {Recipe.objects.count()}')
+        self.stdout.write('tags  distinct, мс  semi-join, мс')
+        for tags_count in options['tags']:
+            selected = slugs[:tags_count]
+            if self.get_distinct_page(selected) != self.get_semi_join_page(
+                selected
+            ):
+                raise CommandError(
+                    f'Результаты фильтров для {tags_count} tags не совпадают.'
+                )
+            distinct = self.measure(
+                self.get_distinct_page, selected, options['repeat']
+            )
+            semi_join = self.measure(
+                self.get_semi_join_page, selected, options['repeat']
+            )
+            self.stdout.write(
+                f'{len(selected):>4}  {distinct:>11.2f}  {semi_join:>12.2f}'
+            )
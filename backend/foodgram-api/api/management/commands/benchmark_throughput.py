@@ -0,0 +1,134 @@
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from urllib.parse import urlsplit
+
+from api.models import Recipe
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.models import Count
+from rest_framework.authtoken.models import Token
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare throughput of read requests served by WSGI handler '
+        'in threads with different CONN_MAX_AGE on current database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=500,
+            help='number of requests for every CONN_MAX_AGE',
+        )
+        parser.add_argument(
+            '--threads',
+            type=int,
+            default=4,
+            help='number of threads like threads of gunicorn worker',
+        )
+        parser.add_argument(
+            '--conn_max_ages',
+            type=int,
+            nargs='+',
+            default=[0, 60],
+            help='values of CONN_MAX_AGE to compare',
+        )
+
+    def get_urls(self):
+        """Get mix of anonymous and authenticated read requests."""
+        user = User.objects.annotate(
+            cart=Count('recipes_in_cart')
+        ).order_by('-cart').first()
+        recipe = Recipe.objects.order_by('-favorites_count').first()
+        if user is None or recipe is None:
+            raise CommandError(
+                'Мало данных для проверки, выполните generate_data.'
+            )
+        token = Token.objects.get_or_create(user=user)[0].key
+        return [
+            ('/api/recipes/', None),
+            (f'/api/recipes/{recipe.pk}/', None),
+            ('/api/tags/', None),
+            ('/api/recipes/', token),
+            ('/api/recipes/?is_favorited=1', token),
+            (f'/api/recipes/{recipe.pk}/', token),
+            ('/api/users/subscriptions/', token),
+            ('/api/recipes/download_shopping_cart/', token),
+        ]
+
+    def request(self, handler, url, token):
+        """Serve request like WSGI server does and return latency."""
+        url = urlsplit(url)
+        environ = {
+            'REQUEST_METHOD': 'GET',
+            'PATH_INFO': url.path,
+            'QUERY_STRING': url.query,
+            'SERVER_NAME': 'localhost',
+            'SERVER_PORT': '80',
+            'SERVER_PROTOCOL': 'HTTP/1.1',
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': 'http',
+            'wsgi.input': BytesIO(),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+        }
+        if token is not None:
+            environ['HTTP_AUTHORIZATION'] = f'Token {token}'
+        statuses = []
+        started = time.perf_counter()
+        response = handler(
+            environ, lambda status, headers: statuses.append(status)
+        )
+        try:
+            for _ in response:
+                pass
+        finally:
+            response.close()
+        if not statuses[0].startswith('200'):
+            raise CommandError(f'{url.geturl()}: {statuses[0]}')
+        return time.perf_counter() - started
+
+    def run(self, handler, urls, count, threads):
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            started = time.perf_counter()
+            timings = list(executor.map(
+                lambda number: self.request(
+                    handler, *urls[number % len(urls)]
+                ),
+                range(count)
+            ))
+            duration = time.perf_counter() - started
+        return count / duration, statistics.median(timings) * 1000
+
+    def handle(self, **options):
+        urls = self.get_urls()
+        handler = WSGIHandler()
+        database = connections.databases['default']
+        conn_max_age = database['CONN_MAX_AGE']
+        self.stdout.write(
+            f'{database["ENGINE"]}, потоков: {options["threads"]}, '
+            f'запросов: {options["requests"]}'
+        )
+        self.stdout.write('CONN_MAX_AGE  запросов/с  p50, мс')
+        try:
+            for max_age in options['conn_max_ages']:
+                database['CONN_MAX_AGE'] = max_age
+                connections.close_all()
+                self.run(handler, urls, len(urls), options['threads'])
+                throughput, median = self.run(
+                    handler, urls, options['requests'], options['threads']
+                )
+                self.stdout.write(
+                    f'{max_age:>12}  {throughput:>10.1f}  {median:>7.2f}'
+                )
+        finally:
+            database['CONN_MAX_AGE'] = conn_max_age
@@ -0,0 +1,144 @@
+import re
+
+from api.filters import RecipeFilter
+from api.models import (FavoriteRecipe, Recipe, RecipeIngredient,
+                        RecipeInShoppingCart, RecipeTag)
+from api.paginations import StandardResultsSetPagination
+from api.views import RecipeViewSet
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from django.test import RequestFactory
+from rest_framework.request import Request
+from users.models import User
+
+TAGS_SORT = (
+    'рецепты тегов находятся по индексу тегов, обход индекса pub_date '
+    'с EXISTS для каждого рецепта в несколько раз замедляет COUNT пагинации'
+)
+RANK_SORT = 'результаты поиска упорядочены по релевантности, её нет в индексе'
+
+
+class Command(BaseCommand):
+    help = (
+        'Explain recipe list queries for every filter combination '
+        'and fail on full scans of large tables and sorts of large results.'
+    )
+    # Filters which large results are sorted by design, with reasons.
+    allowed_sorts = {
+        'один tags': TAGS_SORT,
+        'три tags': TAGS_SORT,
+        'search': RANK_SORT,
+        'search и tags': RANK_SORT,
+    }
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--min_rows',
+            type=int,
+            default=10000,
+            help='check tables and results with at least this number of rows',
+        )
+
+    def get_large_tables(self, min_rows):
+        """Get names of checked tables with at least `min_rows` rows."""
+        return [
+            model._meta.db_table
+            for model in (
+                Recipe, RecipeTag, FavoriteRecipe, RecipeInShoppingCart
+            )
+            if model.objects.count() >= min_rows
+        ]
+
+    def get_filters(self):
+        """Get filter combinations of recipe list with query params,
+        most used tags and ingredient name give largest results.
+        """
+        author = Recipe.objects.values_list('author', flat=True).first()
+        tags = list(
+            RecipeTag.objects.values('tags__slug').annotate(
+                recipes=Count('id')
+            ).order_by('-recipes').values_list('tags__slug', flat=True)[:3]
+        )
+        ingredient = RecipeIngredient.objects.values(
+            'ingredients__name'
+        ).annotate(recipes=Count('id')).order_by('-recipes').values_list(
+            'ingredients__name', flat=True
+        ).first()
+        search = ingredient.split()[0] if ingredient else ''
+        return {
+            'без фильтров': {},
+            'author': {'author': author},
+            'один tags': {'tags': tags[:1]},
+            'три tags': {'tags': tags},
+            'is_favorited': {'is_favorited': 1},
+            'is_in_shopping_cart': {'is_in_shopping_cart': 1},
+            'author и tags': {'author': author, 'tags': tags[:1]},
+            'tags и is_favorited': {'tags': tags, 'is_favorited': 1},
+            'search': {'search': search},
+            'search и tags': {'search': search, 'tags': tags[:1]},
+        }
+
+    def get_queryset(self, user, params):
+        """Get recipe list as RecipeViewSet builds it."""
+        request = Request(RequestFactory().get('/api/recipes/', params))
+        request.user = user
+        view = RecipeViewSet(request=request, action='list', format_kwarg=None)
+        return RecipeFilter(
+            request.query_params, queryset=view.get_queryset(), request=request
+        ).qs
+
+    def get_problems(self, plan, tables, check_sort):
+        """Find full scans of large tables and, if `check_sort`,
+        sorts in query plan.
+        """
+        problems = []
+        for line in plan.splitlines():
+            for table in tables:
+                if re.search(
+                    rf'Seq Scan on {table}\b|\bSCAN (TABLE )?{table}$', line
+                ):
+                    problems.append(line.strip())
+            if check_sort and re.search(
+                r'\bSort\b|USE TEMP B-TREE FOR ORDER BY', line
+            ):
+                problems.append(line.strip())
+        return problems
+
+    def handle(self, **options):
+        tables = self.get_large_tables(options['min_rows'])
+        if not tables:
+            self.stdout.write(
+                f'Нет таблиц с {options["min_rows"]} и более строк, '
+                'проверять нечего.'
+            )
+            return
+        user = User.objects.annotate(
+            favorited=Count('recipe_in_favorites')
+        ).filter(favorited__gt=0).order_by('-favorited').first()
+        if user is None:
+            raise CommandError('Нет пользователей с избранными рецептами.')
+        failed = False
+        for name, params in self.get_filters().items():
+            queryset = self.get_queryset(user, params)
+            plan = queryset[:StandardResultsSetPagination.page_size].explain()
+            problems = self.get_problems(
+                plan, tables,
+                name not in self.allowed_sorts
+                and queryset.count() >= options['min_rows']
+            )
+            if options['verbosity'] > 1:
+                self.stdout.write(plan)
+            if problems:
+                failed = True
+                self.stdout.write(self.style.ERROR(f'{name}:'))
+                for problem in problems:
+                    self.stdout.write(f'    {problem}')
+            elif name in self.allowed_sorts:
+                self.stdout.write(self.style.SUCCESS(
+                    f'{name}: OK, сортировка допустима: '
+                    f'{self.allowed_sorts[name]}'
+                ))
+            else:
+                self.stdout.write(self.style.SUCCESS(f'{name}: OK'))
+        if failed:
+            raise CommandError('Найдены полные сканирования или сортировки.')
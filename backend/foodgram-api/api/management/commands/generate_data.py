@@ -0,0 +1,286 @@
+import hashlib
+import itertools
+import random
+from datetime import timedelta
+from io import BytesIO
+
+from api.cache import reference_data
+from api.images import make_variants
+from api.models import (FavoriteRecipe, Ingredient, Recipe, RecipeIngredient,
+                        RecipeInShoppingCart, RecipeTag, Tag)
+from api.search import recipe_ingredient_index
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from PIL import Image
+from users.models import Follow, User
+
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate synthetic users, tags, recipes, follows, favorites '
+        'and shopping carts with power-law popularity of authors '
+        'and recipes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users', type=int, default=1000, help='number of users'
+        )
+        parser.add_argument(
+            '--recipes', type=int, default=10000, help='number of recipes'
+        )
+        parser.add_argument(
+            '--tags', type=int, default=12, help='number of tags'
+        )
+        parser.add_argument(
+            '--follows',
+            type=int,
+            default=20,
+            help='mean number of follows of user',
+        )
+        parser.add_argument(
+            '--favorites',
+            type=int,
+            default=30,
+            help='mean number of favorite recipes of user',
+        )
+        parser.add_argument(
+            '--carts',
+            type=int,
+            default=5,
+            help='mean number of recipes in shopping cart of user',
+        )
+        parser.add_argument(
+            '--ingredients',
+            type=int,
+            default=8,
+            help='maximal number of ingredients of recipe',
+        )
+        parser.add_argument(
+            '--skew',
+            type=float,
+            default=1.1,
+            help='exponent of power-law popularity',
+        )
+        parser.add_argument(
+            '--prefix',
+            default='synthetic',
+            help='prefix of generated usernames and tag slugs',
+        )
+        parser.add_argument(
+            '--password',
+            default='synthetic-password',
+            help='password of generated users',
+        )
+        parser.add_argument(
+            '--seed', type=int, default=0, help='seed of random generator'
+        )
+
+    def get_cum_weights(self, size, skew):
+        """Cumulative power-law weights for population ordered
+        from the most to the least popular.
+        """
+        return list(itertools.accumulate(
+            1 / rank ** skew for rank in range(1, size + 1)
+        ))
+
+    def choose(self, population, cum_weights, count):
+        """Choose `count` items with power-law popularity."""
+        return self.random.choices(
+            population, cum_weights=cum_weights, k=count
+        )
+
+    def save_image(self):
+        """Save one image shared by generated recipes."""
+        image = Image.new('RGB', (600, 400))
+        image.putdata([
+            (x * 255 // 600, y * 255 // 400, 128)
+            for y in range(400)
+            for x in range(600)
+        ])
+        content = BytesIO()
+        image.save(content, 'PNG')
+        field = Recipe._meta.get_field('image')
+        name = field.generate_filename(
+            None, f'{hashlib.sha256(content.getvalue()).hexdigest()}.png'
+        )
+        return field.storage.save(name, ContentFile(content.getvalue()))
+
+    def create_users(self, prefix, count, password):
+        password = make_password(password)
+        User.objects.bulk_create(
+            [
+                User(
+                    username=f'{prefix}{number}',
+                    email=f'{prefix}{number}@example.com',
+                    first_name='Имя',
+                    last_name='Фамилия',
+                    password=password,
+                )
+                for number in range(count)
+            ],
+            batch_size=BATCH_SIZE,
+            ignore_conflicts=True
+        )
+        return list(User.objects.filter(
+            username__startswith=prefix
+        ).values_list('pk', flat=True))
+
+    def create_tags(self, prefix, count):
+        colors = set(Tag.objects.values_list('color', flat=True))
+        tags = []
+        for number in range(count):
+            color = f'#{self.random.randrange(0x1000000):06X}'
+            while color in colors:
+                color = f'#{self.random.randrange(0x1000000):06X}'
+            colors.add(color)
+            tags.append(Tag(
+                name=f'{prefix}-{number}'[:30],
+                color=color,
+                slug=f'{prefix}-{number}',
+            ))
+        Tag.objects.bulk_create(tags, ignore_conflicts=True)
+        return list(Tag.objects.filter(
+            slug__in=[tag.slug for tag in tags]
+        ).values_list('pk', flat=True))
+
+    def create_recipes(self, authors, count, image, skew):
+        self.random.shuffle(authors)
+        now = timezone.now()
+        last = Recipe.objects.aggregate(last=Max('pk'))['last'] or 0
+        recipes = [
+            Recipe(
+                author_id=author,
+                name=f'Рецепт {number}',
+                image=image,
+                text='Описание рецепта. ' * self.random.randint(1, 20),
+                cooking_time=self.random.randint(1, 360),
+            )
+            for number, author in enumerate(self.choose(
+                authors, self.get_cum_weights(len(authors), skew), count
+            ))
+        ]
+        Recipe.objects.bulk_create(recipes, batch_size=BATCH_SIZE)
+        ids = list(Recipe.objects.filter(
+            pk__gt=last
+        ).order_by('pk').values_list('pk', flat=True))
+        Recipe.objects.bulk_update(
+            [
+                Recipe(pk=pk, pub_date=now - timedelta(minutes=len(ids) - i))
+                for i, pk in enumerate(ids)
+            ],
+            ('pub_date',),
+            batch_size=BATCH_SIZE
+        )
+        return ids
+
+    def create_relations(self, model, fields, pairs):
+        model.objects.bulk_create(
+            [
+                model(**{f'{field}_id': pk for field, pk in zip(fields, pair)})
+                for pair in set(pairs)
+            ],
+            batch_size=BATCH_SIZE,
+            ignore_conflicts=True
+        )
+
+    def create_recipe_ingredients(self, recipes, ingredients, maximum, skew):
+        self.random.shuffle(ingredients)
+        cum_weights = self.get_cum_weights(len(ingredients), skew)
+        RecipeIngredient.objects.bulk_create(
+            [
+                RecipeIngredient(
+                    recipe_id=recipe,
+                    ingredients_id=ingredient,
+                    amount=self.random.randint(1, 500),
+                )
+                for recipe in recipes
+                for ingredient in set(self.choose(
+                    ingredients,
+                    cum_weights,
+                    self.random.randint(1, maximum)
+                ))
+            ],
+            batch_size=BATCH_SIZE,
+            ignore_conflicts=True
+        )
+
+    def get_pairs(self, users, targets, mean, skew):
+        """Pairs of uniformly chosen users and popular targets."""
+        cum_weights = self.get_cum_weights(len(targets), skew)
+        count = len(users) * mean
+        return zip(
+            self.random.choices(users, k=count),
+            self.choose(targets, cum_weights, count)
+        )
+
+    def handle(self, **options):
+        if options['users'] < 1 or options['recipes'] < 1:
+            raise CommandError('Нужен хотя бы один пользователь и рецепт.')
+        ingredients = list(Ingredient.objects.values_list('pk', flat=True))
+        if not ingredients:
+            raise CommandError(
+                'Нет ингредиентов, сначала выполните import_ingredients.'
+            )
+        self.random = random.Random(options['seed'])
+        skew = options['skew']
+        image = self.save_image()
+        with transaction.atomic():
+            users = self.create_users(
+                options['prefix'], options['users'], options['password']
+            )
+            tags = self.create_tags(options['prefix'], options['tags'])
+            recipes = self.create_recipes(
+                users, options['recipes'], image, skew
+            )
+            self.random.shuffle(tags)
+            tag_weights = self.get_cum_weights(len(tags), skew)
+            self.create_relations(RecipeTag, ('recipe', 'tags'), (
+                (recipe, tag)
+                for recipe in recipes
+                for tag in self.choose(
+                    tags, tag_weights, self.random.randint(1, 3)
+                )
+            ))
+            self.create_recipe_ingredients(
+                recipes, ingredients, options['ingredients'], skew
+            )
+            self.random.shuffle(recipes)
+            self.create_relations(
+                Follow,
+                ('user', 'following'),
+                (
+                    (user, following)
+                    for user, following in self.get_pairs(
+                        users, users, options['follows'], skew
+                    )
+                    if user != following
+                )
+            )
+            self.create_relations(
+                FavoriteRecipe,
+                ('user', 'recipe'),
+                self.get_pairs(users, recipes, options['favorites'], skew)
+            )
+            self.create_relations(
+                RecipeInShoppingCart,
+                ('user', 'recipe_in_cart'),
+                self.get_pairs(users, recipes, options['carts'], skew)
+            )
+            call_command('update_counters', stdout=self.stdout)
+            call_command('rebuild_shopping_lists', stdout=self.stdout)
+            call_command('rebuild_recipe_search', stdout=self.stdout)
+        reference_data.bump_version()
+        recipe_ingredient_index.reset()
+        make_variants(image)
+        self.stdout.write(
+            f'Создано: пользователей {len(users)}, тегов {len(tags)}, '
+            f'рецептов {len(recipes)}.'
+        )
@@ -1,9 +1,14 @@
 import csv
+import io
 import json
 import os
+import time
+from itertools import islice
 
+from api.cache import reference_data
 from api.models import Ingredient
 from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
 
 
 class Command(BaseCommand):
@@ -30,24 +35,103 @@ class Command(BaseCommand):
             action='store_true',
             help='write json data to database',
         )
+        parser.add_argument(
+            '--batch_size',
+            type=int,
+            default=1000,
+            help='number of rows inserted at once',
+        )
+        parser.add_argument(
+            '--dry_run',
+            action='store_true',
+            help='count rows to insert without writing to database',
+        )
 
-    def write_db(self, data, ext):
-        """Function for write to db table."""
-        if ext not in ('JSON', 'CSV'):
-            return CommandError('Unknown extension')
+    def get_rows(self, data, ext):
+        """Yield (name, measurement_unit) pairs from file data."""
         if ext == 'JSON':
-            self.stdout.write('JSON файл обнаружен. Начинаю запись в БД.')
             for obj in data:
-                Ingredient.objects.get_or_create(**obj)
-            self.stdout.write('Данные из JSON успешно импортированы в БД.')
+                yield obj['name'], obj['measurement_unit']
         elif ext == 'CSV':
-            self.stdout.write('CSV файл обнаружен. Начинаю запись в БД.')
             for obj in data:
-                Ingredient.objects.get_or_create(
-                    name=obj[0],
-                    measurement_unit=obj[1]
-                )
-            self.stdout.write('Данные из CSV успешно импортированы в БД.')
+                yield obj[0], obj[1]
+
+    def get_chunks(self, rows, size):
+        """Split rows into lists of given size."""
+        rows = iter(rows)
+        chunk = list(islice(rows, size))
+        while chunk:
+            yield chunk
+            chunk = list(islice(rows, size))
+
+    def copy_to_db(self, ingredients):
+        """Insert ingredients with COPY, PostgreSQL only."""
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(ingredients)
+        buffer.seek(0)
+        table = connection.ops.quote_name(Ingredient._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.copy_expert(
+                f'COPY {table} (name, measurement_unit) '
+                'FROM STDIN WITH (FORMAT csv)',
+                buffer
+            )
+
+    def insert_to_db(self, ingredients, batch_size):
+        """Insert ingredients with fastest way for current database."""
+        if connection.vendor == 'postgresql':
+            self.copy_to_db(ingredients)
+            return
+        Ingredient.objects.bulk_create(
+            [
+                Ingredient(name=name, measurement_unit=measurement_unit)
+                for name, measurement_unit in ingredients
+            ],
+            batch_size=batch_size
+        )
+
+    def write_db(self, data, ext, batch_size=1000, dry_run=False):
+        """Function for write to db table.
+
+        Only missing (name, measurement_unit) pairs are inserted,
+        chunk by chunk inside one transaction.
+        """
+        if ext not in ('JSON', 'CSV'):
+            return CommandError('Unknown extension')
+        self.stdout.write(f'{ext} файл обнаружен. Начинаю запись в БД.')
+        started = time.monotonic()
+        existing = set(
+            Ingredient.objects.values_list('name', 'measurement_unit')
+        )
+        imported = set()
+        inserted = skipped = duplicates = 0
+        with transaction.atomic():
+            for chunk in self.get_chunks(
+                self.get_rows(data, ext), batch_size
+            ):
+                ingredients = []
+                for ingredient in chunk:
+                    if ingredient in existing:
+                        skipped += 1
+                    elif ingredient in imported:
+                        duplicates += 1
+                    else:
+                        imported.add(ingredient)
+                        ingredients.append(ingredient)
+                if ingredients and not dry_run:
+                    self.insert_to_db(ingredients, batch_size)
+                inserted += len(ingredients)
+        if inserted and not dry_run:
+            reference_data.bump_version()
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            f'Добавлено: {inserted}, пропущено: {skipped}, '
+            f'дубликатов: {duplicates}, время: {elapsed:.2f} с.'
+        )
+        if dry_run:
+            self.stdout.write('Пробный запуск, данные не записаны.')
+        else:
+            self.stdout.write(f'Данные из {ext} успешно импортированы в БД.')
         self.stdout.write('Конец работы функции записи в БД.')
         return None
 
@@ -79,11 +163,16 @@ class Command(BaseCommand):
         if options['write_csv']:
             with open(csv_file, 'r', encoding='utf-8') as file:
                 csv_data = csv.reader(file, delimiter=',')
-                self.write_db(csv_data, 'CSV')
+                self.write_db(
+                    csv_data, 'CSV', options['batch_size'], options['dry_run']
+                )
         if options['write_json']:
             with open(json_file, 'r', encoding='utf-8') as file:
                 json_data = json.load(file)
-                self.write_db(json_data, 'JSON')
+                self.write_db(
+                    json_data, 'JSON',
+                    options['batch_size'], options['dry_run']
+                )
         if options['read']:
             self.read_db()
         if options['delete']:
@@ -0,0 +1,25 @@
+from api.images import make_variants
+from api.models import Recipe
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Make missing resized variants of recipe images.'
+
+    def handle(self, **options):
+        names = {
+            image
+            for image, variants in Recipe.objects.exclude(
+                image=''
+            ).values_list('image', 'image_variants')
+            if variants.get('source') != image
+        }
+        failed = 0
+        for name in sorted(names):
+            if not make_variants(name):
+                failed += 1
+                self.stderr.write(f'{name}: ошибка записана в журнал')
+        self.stdout.write(
+            f'Обработано изображений: {len(names) - failed}, '
+            f'с ошибками: {failed}'
+        )
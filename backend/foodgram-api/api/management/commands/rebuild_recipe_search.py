@@ -0,0 +1,13 @@
+from api.search import recipe_search
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+
+class Command(BaseCommand):
+    help = 'Create full-text search index of recipes and fill it again.'
+
+    @transaction.atomic
+    def handle(self, **options):
+        self.stdout.write(
+            f'Рецептов в поисковом индексе: {recipe_search.rebuild()}'
+        )
@@ -0,0 +1,11 @@
+from api.shopping_lists import rebuild
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+
+class Command(BaseCommand):
+    help = 'Recount shopping lists of all users from their shopping carts.'
+
+    @transaction.atomic
+    def handle(self, **options):
+        self.stdout.write(f'Позиций в списках покупок: {rebuild()}')
@@ -0,0 +1,46 @@
+from api.models import FavoriteRecipe, Recipe
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = 'Recount Recipe.favorites_count and User.recipes_count.'
+
+    def get_count(self, queryset, field):
+        """Subquery counting rows of queryset for outer object."""
+        return Coalesce(Subquery(
+            queryset.filter(
+                **{field: OuterRef('pk')}
+            ).order_by().values(field).annotate(
+                count=Count('pk')
+            ).values('count')
+        ), 0)
+
+    def update(self, model, counter, actual):
+        """Update only drifted counters in one query."""
+        drifted = model.objects.annotate(actual=actual).exclude(
+            **{counter: F('actual')}
+        ).values_list('pk', flat=True)
+        return model.objects.filter(pk__in=list(drifted)).update(
+            **{counter: actual}
+        )
+
+    @transaction.atomic
+    def handle(self, **options):
+        recipes = self.update(
+            Recipe,
+            'favorites_count',
+            self.get_count(FavoriteRecipe.objects.all(), 'recipe')
+        )
+        users = self.update(
+            User,
+            'recipes_count',
+            self.get_count(Recipe.objects.all(), 'author')
+        )
+        self.stdout.write(
+            f'Исправлено счетчиков: рецептов {recipes}, '
+            f'пользователей {users}.'
+        )
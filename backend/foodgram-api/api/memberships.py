@@ -0,0 +1,88 @@
+import time
+
+from api.models import FavoriteRecipe, RecipeInShoppingCart
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from users.models import Follow
+
+
+class MembershipCache:
+    """Cache for ids of favorite recipes, recipes in shopping cart
+    and followed authors of users.
+
+    Key of set includes version of user's set, every change bumps
+    the version and moves set to new key with added or removed ids.
+    Set which missed a change is left under old key and is reloaded
+    from database. Backend is chosen by MEMBERSHIP_CACHE alias.
+    """
+
+    querysets = {
+        'favorites': (FavoriteRecipe.objects, 'recipe'),
+        'shopping_cart': (RecipeInShoppingCart.objects, 'recipe_in_cart'),
+        'follows': (Follow.objects, 'following'),
+    }
+
+    @property
+    def cache(self):
+        return caches[settings.MEMBERSHIP_CACHE]
+
+    def get_version_key(self, user_id, kind):
+        return f'membership:{kind}:{user_id}:version'
+
+    def get_key(self, user_id, kind, version):
+        return f'membership:{kind}:{user_id}:{version}'
+
+    def get_version(self, user_id, kind):
+        version_key = self.get_version_key(user_id, kind)
+        version = self.cache.get(version_key)
+        if version is None:
+            self.cache.add(version_key, time.time_ns(), timeout=None)
+            version = self.cache.get(version_key)
+        return version
+
+    def get_ids(self, user, kind):
+        """Return set of ids of `kind` for user."""
+        if not user.is_authenticated:
+            return frozenset()
+        version = self.get_version(user.pk, kind)
+        key = self.get_key(user.pk, kind, version)
+        ids = self.cache.get(key)
+        if ids is None:
+            manager, field = self.querysets[kind]
+            ids = frozenset(
+                manager.filter(user=user).values_list(field, flat=True)
+            )
+            self.cache.set(
+                key, ids, timeout=settings.MEMBERSHIP_CACHE_TIMEOUT
+            )
+        return ids
+
+    def update(self, user_id, kind, added=(), removed=()):
+        """Move set of user to new version with changed ids."""
+        version_key = self.get_version_key(user_id, kind)
+        try:
+            version = self.cache.incr(version_key)
+        except ValueError:
+            self.cache.set(version_key, time.time_ns(), timeout=None)
+            return
+        ids = self.cache.get(self.get_key(user_id, kind, version - 1))
+        if ids is not None:
+            self.cache.set(
+                self.get_key(user_id, kind, version),
+                ids.union(added).difference(removed),
+                timeout=settings.MEMBERSHIP_CACHE_TIMEOUT
+            )
+
+    def add(self, user, kind, *ids):
+        """Add ids to set of user after transaction is committed."""
+        transaction.on_commit(lambda: self.update(user.pk, kind, added=ids))
+
+    def remove(self, user, kind, *ids):
+        """Remove ids from set of user after transaction is committed."""
+        transaction.on_commit(
+            lambda: self.update(user.pk, kind, removed=ids)
+        )
+
+
+memberships = MembershipCache()
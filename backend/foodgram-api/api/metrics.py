@@ -0,0 +1,229 @@
+import bisect
+import cProfile
+import io
+import pstats
+import random
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from threading import Lock
+
+from django.conf import settings
+
+current_timings = ContextVar('current_timings', default=None)
+
+
+class Histogram:
+    """Histogram with fixed buckets, so its memory does not grow."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class RequestTimings:
+    """Durations of phases and number of queries of one request."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.durations = {}
+        self.queries = 0
+        self.running = {}
+
+    def add(self, phase, duration):
+        self.durations[phase] = self.durations.get(phase, 0) + duration
+
+    def start(self, phase):
+        self.running[phase] = (
+            time.perf_counter(), self.durations.get('db', 0)
+        )
+
+    def finish(self, phase, exclude_db=False):
+        """Add duration of started phase, optionally without time
+        of queries made during it.
+        """
+        if phase not in self.running:
+            return
+        started, db = self.running.pop(phase)
+        duration = time.perf_counter() - started
+        if exclude_db:
+            duration -= self.durations.get('db', 0) - db
+        self.add(phase, duration)
+
+    def get_server_timing(self):
+        """Get value of Server-Timing header."""
+        return ', '.join(
+            f'{phase};dur={duration * 1000:.1f}'
+            + (f';desc="{self.queries} queries"' if phase == 'db' else '')
+            for phase, duration in self.durations.items()
+        )
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        """Database execute wrapper counting queries and their time."""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.add('db', time.perf_counter() - started)
+
+
+@contextmanager
+def measure(phase):
+    """Add duration of block to `phase` of current request."""
+    timings = current_timings.get()
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(phase, time.perf_counter() - started)
+
+
+class Metrics:
+    """In-process histograms of request phases by view.
+
+    Every gunicorn worker keeps its own histograms, so Prometheus
+    has to scrape workers separately or sum them by instance.
+    """
+
+    prefix = 'foodgram'
+    phases = {
+        'total': 'Total duration of request in seconds.',
+        'view': 'Duration of view without database queries in seconds.',
+        'db': 'Duration of database queries in seconds.',
+        'serialize': 'Duration of building response data in seconds.',
+        'render': 'Duration of rendering response in seconds.',
+    }
+
+    def __init__(self):
+        self.lock = Lock()
+        self.histograms = {}
+        self.responses = {}
+
+    def observe(self, view, status_code, timings):
+        with self.lock:
+            for phase, duration in timings.durations.items():
+                self.get_histogram(
+                    phase, view, settings.METRICS_DURATION_BUCKETS
+                ).observe(duration)
+            self.get_histogram(
+                'queries', view, settings.METRICS_QUERY_BUCKETS
+            ).observe(timings.queries)
+            key = (view, status_code)
+            self.responses[key] = self.responses.get(key, 0) + 1
+
+    def get_histogram(self, name, view, buckets):
+        key = (name, view)
+        if key not in self.histograms:
+            self.histograms[key] = Histogram(buckets)
+        return self.histograms[key]
+
+    def render_histogram(self, name, view, histogram):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(
+            (*histogram.buckets, '+Inf'), histogram.counts
+        ):
+            cumulative += count
+            lines.append(
+                f'{name}_bucket{{view="{view}",le="{bound}"}} {cumulative}'
+            )
+        lines.append(f'{name}_sum{{view="{view}"}} {histogram.sum}')
+        lines.append(f'{name}_count{{view="{view}"}} {histogram.count}')
+        return lines
+
+    def render(self):
+        """Render metrics in Prometheus text format."""
+        names = {
+            phase: (f'{self.prefix}_{phase}_duration_seconds', description)
+            for phase, description in self.phases.items()
+        }
+        names['queries'] = (
+            f'{self.prefix}_db_queries', 'Number of database queries.'
+        )
+        with self.lock:
+            histograms = sorted(self.histograms.items())
+            responses = sorted(self.responses.items())
+        lines = []
+        for kind, (name, description) in names.items():
+            lines.append(f'# HELP {name} {description}')
+            lines.append(f'# TYPE {name} histogram')
+            for (histogram_kind, view), histogram in histograms:
+                if histogram_kind == kind:
+                    lines.extend(
+                        self.render_histogram(name, view, histogram)
+                    )
+        name = f'{self.prefix}_responses_total'
+        lines.append(f'# HELP {name} Number of responses by status code.')
+        lines.append(f'# TYPE {name} counter')
+        for (view, status_code), count in responses:
+            lines.append(
+                f'{name}{{view="{view}",status="{status_code}"}} {count}'
+            )
+        return '\n'.join(lines) + '\n'
+
+
+class Profiler:
+    """Sampled cProfile of requests keeping stats of the slow ones.
+
+    Only one request of a process is profiled at a time and
+    only last PROFILE_KEEP slow profiles are kept.
+    """
+
+    def __init__(self):
+        self.lock = Lock()
+        self.profiles = deque(maxlen=settings.PROFILE_KEEP)
+
+    def should_sample(self):
+        return (
+            settings.PROFILE_SAMPLE_RATE > 0
+            and random.random() < settings.PROFILE_SAMPLE_RATE
+        )
+
+    @contextmanager
+    def profile(self, get_view, timings):
+        """Profile block and keep stats if request is slow."""
+        if not self.should_sample() or not self.lock.acquire(blocking=False):
+            yield
+            return
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+            try:
+                yield
+            finally:
+                profile.disable()
+        finally:
+            self.lock.release()
+        duration = time.perf_counter() - timings.started
+        if duration < settings.PROFILE_MIN_DURATION:
+            return
+        stats = io.StringIO()
+        pstats.Stats(profile, stream=stats).sort_stats(
+            'cumulative'
+        ).print_stats(settings.PROFILE_LINES)
+        self.profiles.append({
+            'view': get_view(),
+            'duration': duration,
+            'queries': timings.queries,
+            'time': time.time(),
+            'stats': stats.getvalue(),
+        })
+
+    def get_profiles(self):
+        return list(reversed(self.profiles))
+
+
+metrics = Metrics()
+profiler = Profiler()
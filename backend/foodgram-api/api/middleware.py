@@ -0,0 +1,70 @@
+import time
+
+from api.metrics import RequestTimings, current_timings, metrics, profiler
+from api.queries import detect_repeated_queries
+from django.conf import settings
+from django.db import connection
+
+
+def get_view_name(request):
+    """Get name of resolved view like `RecipeViewSet.list`."""
+    match = request.resolver_match
+    if match is None:
+        return 'unresolved'
+    view_class = getattr(match.func, 'cls', None)
+    if view_class is None:
+        return match.view_name
+    method = request.method.lower()
+    actions = getattr(match.func, 'actions', None) or {}
+    return f'{view_class.__name__}.{actions.get(method, method)}'
+
+
+class MetricsMiddleware:
+    """Measure total, view, database, serialize and render time
+    of requests into histograms by view and Server-Timing header.
+
+    Some of requests are profiled, see api.metrics.Profiler.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+        try:
+            with connection.execute_wrapper(
+                timings.execute_wrapper
+            ), profiler.profile(lambda: get_view_name(request), timings):
+                response = self.get_response(request)
+        finally:
+            current_timings.reset(token)
+        timings.finish('view', exclude_db=True)
+        timings.finish('render')
+        timings.add('total', time.perf_counter() - timings.started)
+        metrics.observe(
+            get_view_name(request), response.status_code, timings
+        )
+        if settings.METRICS_SERVER_TIMING:
+            response['Server-Timing'] = timings.get_server_timing()
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        current_timings.get().start('view')
+
+    def process_template_response(self, request, response):
+        timings = current_timings.get()
+        timings.finish('view', exclude_db=True)
+        timings.start('render')
+        return response
+
+
+class RepeatedQueriesMiddleware:
+    """Detect statements repeated by request, see api.queries."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with detect_repeated_queries(settings.NPLUSONE_RAISE):
+            return self.get_response(request)
@@ -1,3 +1,4 @@
+from api.images import ContentAddressedStorage
 from django.core.validators import (MaxValueValidator, MinValueValidator,
                                     validate_unicode_slug)
 from django.db import models
@@ -66,7 +67,10 @@ class Recipe(models.Model):
         through='RecipeInShoppingCart'
     )
     name = models.CharField(max_length=30)
-    image = models.ImageField(upload_to='recipes/')
+    image = models.ImageField(
+        upload_to='recipes/', storage=ContentAddressedStorage()
+    )
+    image_variants = models.JSONField(default=dict, editable=False)
     text = models.TextField()
     cooking_time = models.PositiveSmallIntegerField(
         validators=[
@@ -81,12 +85,22 @@ class Recipe(models.Model):
         ]
     )
     pub_date = models.DateTimeField(auto_now_add=True)
+    favorites_count = models.PositiveIntegerField(default=0, editable=False)
 
     def __str__(self):
         return self.name
 
     class Meta:
         ordering = ('-pub_date',)
+        indexes = [
+            models.Index(
+                fields=('-pub_date', '-id'), name='recipe_pub_date_idx'
+            ),
+            models.Index(
+                fields=('author', '-pub_date'),
+                name='recipe_author_pub_date_idx'
+            ),
+        ]
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
 
@@ -108,6 +122,9 @@ class RecipeTag(models.Model):
                 name='recipe_tags'
             )
         ]
+        indexes = [
+            models.Index(fields=('tags', 'recipe'), name='tag_recipe_idx'),
+        ]
 
 
 class RecipeIngredient(models.Model):
@@ -193,3 +210,35 @@ class RecipeInShoppingCart(models.Model):
                 name='user_recipe_in_cart'
             )
         ]
+
+
+class ShoppingListItem(models.Model):
+    """Model of summed amount of ingredient in user's shopping cart.
+
+    Rows are kept in sync with shopping cart and recipe ingredients
+    by functions from api.shopping_lists.
+    """
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_list'
+    )
+    ingredients = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='in_shopping_lists'
+    )
+    amount = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.user} {self.ingredients} {self.amount}'
+
+    class Meta:
+        ordering = ('-id',)
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'ingredients',),
+                name='user_shopping_list_ingredient'
+            )
+        ]
@@ -1,9 +1,46 @@
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import CursorPagination, PageNumberPagination
 
 
 class StandardResultsSetPagination(PageNumberPagination):
-    """Custom pagination class for view."""
+    """Custom pagination class for view.
+
+    Page size is taken from `limit` query param, as frontend sends it.
+    """
 
     page_size = 6
     page_query_param = 'page'
+    page_size_query_param = 'limit'
     max_page_size = 1000
+
+
+class CursorResultsSetPagination(CursorPagination):
+    """Keyset pagination class for view.
+
+    Ordering is taken from `cursor_ordering` attribute of view.
+    """
+
+    page_size = 6
+    ordering = '-id'
+
+    def get_ordering(self, request, queryset, view):
+        self.ordering = getattr(view, 'cursor_ordering', self.ordering)
+        return super().get_ordering(request, queryset, view)
+
+
+class CursorPaginationMixin:
+    """Mixin for view to switch from default pagination to keyset one
+    when `cursor` query param is passed, e.g. `?cursor=` for first page.
+    """
+
+    cursor_pagination_class = CursorResultsSetPagination
+    cursor_ordering = '-id'
+
+    @property
+    def paginator(self):
+        if (
+            not hasattr(self, '_paginator')
+            and self.cursor_pagination_class.cursor_query_param
+            in self.request.query_params
+        ):
+            self._paginator = self.cursor_pagination_class()
+        return super().paginator
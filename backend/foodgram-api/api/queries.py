@@ -0,0 +1,126 @@
+import inspect
+import logging
+import os
+import re
+import sys
+import time
+from contextlib import contextmanager
+from threading import Lock
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+STRING = re.compile(r"'(?:[^']|'')*'")
+NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+PLACEHOLDERS = re.compile(r'\(\s*(?:%s|\?)(?:\s*,\s*(?:%s|\?))*\s*\)')
+INSTRUMENTATION = (
+    os.path.join('api', 'queries.py'),
+    os.path.join('api', 'metrics.py'),
+    os.path.join('api', 'middleware.py'),
+)
+
+
+class RepeatedQueryError(Exception):
+    """Same statement is run too many times during one request."""
+
+
+def get_fingerprint(sql):
+    """Get statement with literals and lists of parameters replaced."""
+    sql = STRING.sub('?', sql)
+    sql = NUMBER.sub('?', sql)
+    return PLACEHOLDERS.sub('(?)', sql)
+
+
+def is_project_file(filename):
+    return (
+        filename is not None
+        and filename.startswith(str(settings.BASE_DIR))
+        and 'site-packages' not in filename
+        and not filename.endswith(INSTRUMENTATION)
+    )
+
+
+def get_caller():
+    """Get name of innermost project function or method of project class
+    which made query, like `GetRecipeSerializer.get_is_favorited`.
+
+    Inside of `to_representation` of serializer name of serialized field
+    is used instead, like `GetRecipeSerializer.ingredients`.
+    """
+    frame = inspect.currentframe().f_back
+    while frame is not None:
+        owner = type(frame.f_locals.get('self'))
+        module = sys.modules.get(owner.__module__)
+        is_project_class = is_project_file(getattr(module, '__file__', None))
+        if is_project_file(frame.f_code.co_filename):
+            name = (
+                owner.__name__ if is_project_class
+                else frame.f_globals['__name__']
+            )
+            return f'{name}.{frame.f_code.co_name}'
+        field = frame.f_locals.get('field')
+        if (
+            is_project_class
+            and frame.f_code.co_name == 'to_representation'
+            and hasattr(field, 'field_name')
+        ):
+            return f'{owner.__name__}.{field.field_name}'
+        frame = frame.f_back
+    return 'unknown'
+
+
+class RepeatedQueryDetector:
+    """Counter of normalized statements of one request.
+
+    Statement run more than NPLUSONE_THRESHOLD times is reported once,
+    as RepeatedQueryError if `raise_errors` or as rate limited warning.
+    """
+
+    logged = {}
+    logged_lock = Lock()
+
+    def __init__(self, raise_errors=False):
+        self.raise_errors = raise_errors
+        self.counts = {}
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        fingerprint = get_fingerprint(sql)
+        count = self.counts.get(fingerprint, 0) + 1
+        self.counts[fingerprint] = count
+        if count == settings.NPLUSONE_THRESHOLD + 1:
+            self.report(fingerprint, get_caller())
+        return execute(sql, params, many, context)
+
+    def report(self, fingerprint, caller):
+        message = (
+            f'{caller} runs statement more than '
+            f'{settings.NPLUSONE_THRESHOLD} times: {fingerprint}'
+        )
+        if self.raise_errors:
+            raise RepeatedQueryError(message)
+        if self.should_log((caller, fingerprint)):
+            logger.warning(message)
+
+    @classmethod
+    def should_log(cls, key):
+        """Allow one warning for caller and statement in interval."""
+        now = time.monotonic()
+        with cls.logged_lock:
+            if now - cls.logged.get(key, -float('inf')) < (
+                settings.NPLUSONE_LOG_INTERVAL
+            ):
+                return False
+            if len(cls.logged) >= 1000:
+                cls.logged.clear()
+            cls.logged[key] = now
+        return True
+
+
+@contextmanager
+def detect_repeated_queries(raise_errors=True):
+    """Detect repeated statements of block, e.g. in tests."""
+    detector = RepeatedQueryDetector(raise_errors)
+    with connection.execute_wrapper(detector.execute_wrapper):
+        yield detector
@@ -0,0 +1,103 @@
+import abc
+import csv
+import json
+
+import orjson
+from rest_framework import renderers
+
+
+class Echo:
+    """File-like object that returns written value instead of storing it."""
+
+    def write(self, value):
+        return value
+
+
+class FastJSONRenderer(renderers.JSONRenderer):
+    """JSON renderer with the same compact UTF-8 output as JSONRenderer
+    produced by orjson.
+
+    Indented, ASCII-only and non-compact output is rendered by JSONRenderer.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            data is None
+            or self.ensure_ascii
+            or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context or {})
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        return orjson.dumps(
+            data,
+            default=self.encoder_class().default,
+            option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS,
+        ).replace(b'\xe2\x80\xa8', b'\\u2028').replace(
+            b'\xe2\x80\xa9', b'\\u2029'
+        )
+
+
+class ShoppingListRenderer(renderers.BaseRenderer, metaclass=abc.ABCMeta):
+    """Base renderer for shopping list streamed row by row."""
+
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        """Render non-streamed payloads, e.g. error details."""
+        return json.dumps(data, ensure_ascii=False).encode(self.charset)
+
+    @abc.abstractmethod
+    def stream(self, ingredients):
+        """Yield chunks of shopping list for every ingredient."""
+
+
+class ShoppingListTextRenderer(ShoppingListRenderer):
+    """Shopping list as plain text."""
+
+    media_type = 'text/plain'
+    format = 'txt'
+
+    def stream(self, ingredients):
+        for ingredient in ingredients:
+            yield (
+                f"{ingredient['ingredients__name']} "
+                f"{ingredient['ingredients__measurement_unit']} --> "
+                f"{ingredient['amount']}\n"
+            )
+
+
+class ShoppingListCSVRenderer(ShoppingListRenderer):
+    """Shopping list as CSV table."""
+
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def stream(self, ingredients):
+        writer = csv.writer(Echo())
+        yield writer.writerow(('name', 'measurement_unit', 'amount'))
+        for ingredient in ingredients:
+            yield writer.writerow((
+                ingredient['ingredients__name'],
+                ingredient['ingredients__measurement_unit'],
+                ingredient['amount'],
+            ))
+
+
+class ShoppingListJSONRenderer(ShoppingListRenderer):
+    """Shopping list as JSON array."""
+
+    media_type = 'application/json'
+    format = 'json'
+
+    def stream(self, ingredients):
+        separator = '['
+        for ingredient in ingredients:
+            yield separator + json.dumps({
+                'name': ingredient['ingredients__name'],
+                'measurement_unit': ingredient[
+                    'ingredients__measurement_unit'
+                ],
+                'amount': ingredient['amount'],
+            }, ensure_ascii=False)
+            separator = ','
+        yield '[]' if separator == '[' else ']'
@@ -0,0 +1,88 @@
+from collections import defaultdict
+
+from api.fields import get_image_variant_urls
+from api.models import Recipe, RecipeIngredient, RecipeTag
+from django.db.models import QuerySet
+from rest_framework import serializers
+from users.models import User
+
+pub_date_field = serializers.DateTimeField()
+
+
+def represent(objects, fields):
+    """Represent queryset by `.values()` rows or objects by their attributes
+    as ModelSerializer with given fields does.
+    """
+    if isinstance(objects, QuerySet):
+        return list(objects.values(*fields))
+    return [
+        {field: getattr(obj, field) for field in fields} for obj in objects
+    ]
+
+
+def get_image_url(name, storage, request=None):
+    """Get URL of image as ImageField does."""
+    if not name:
+        return None
+    url = storage.url(name)
+    return request.build_absolute_uri(url) if request else url
+
+
+def represent_recipes(ids, request=None):
+    """Represent recipes as GetRecipeSerializer does for anonymous user.
+
+    Rows are fetched with `.values()` by four queries
+    and returned as dict with recipe ids as keys.
+    """
+    recipes = list(Recipe.objects.filter(pk__in=ids).values(
+        'id', 'author', 'name', 'image', 'image_variants', 'text',
+        'cooking_time', 'pub_date', 'favorites_count',
+    ))
+    authors = {
+        author['id']: author
+        for author in User.objects.filter(
+            pk__in={recipe['author'] for recipe in recipes}
+        ).values('email', 'id', 'username', 'first_name', 'last_name')
+    }
+    tags = defaultdict(list)
+    for row in RecipeTag.objects.filter(recipe__in=ids).order_by(
+        'tags__name'
+    ).values('recipe', 'tags__id', 'tags__name', 'tags__color', 'tags__slug'):
+        tags[row['recipe']].append({
+            'id': row['tags__id'],
+            'name': row['tags__name'],
+            'color': row['tags__color'],
+            'slug': row['tags__slug'],
+        })
+    ingredients = defaultdict(list)
+    for row in RecipeIngredient.objects.filter(recipe__in=ids).values(
+        'recipe', 'ingredients__id', 'ingredients__name',
+        'ingredients__measurement_unit', 'amount'
+    ):
+        ingredients[row['recipe']].append({
+            'id': row['ingredients__id'],
+            'name': row['ingredients__name'],
+            'measurement_unit': row['ingredients__measurement_unit'],
+            'amount': row['amount'],
+        })
+    storage = Recipe._meta.get_field('image').storage
+    return {
+        recipe['id']: {
+            'id': recipe['id'],
+            'tags': tags[recipe['id']],
+            'author': dict(authors[recipe['author']], is_subscribed=False),
+            'ingredients': ingredients[recipe['id']],
+            'is_favorited': False,
+            'is_in_shopping_cart': False,
+            'name': recipe['name'],
+            'image': get_image_url(recipe['image'], storage, request),
+            'image_variants': get_image_variant_urls(
+                recipe['image'], recipe['image_variants'], storage, request
+            ) if recipe['image'] else None,
+            'text': recipe['text'],
+            'cooking_time': recipe['cooking_time'],
+            'pub_date': pub_date_field.to_representation(recipe['pub_date']),
+            'favorites_count': recipe['favorites_count'],
+        }
+        for recipe in recipes
+    }
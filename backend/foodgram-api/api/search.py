@@ -0,0 +1,542 @@
+import re
+import time
+from array import array
+from bisect import bisect_left, insort
+from collections import Counter, defaultdict
+from functools import partial
+from threading import Lock, local
+
+from api.cache import recipe_responses, reference_data
+from api.models import Ingredient, Recipe, RecipeIngredient
+from django.conf import settings
+from django.core.cache import caches
+from django.db import NotSupportedError, connection, transaction
+
+BATCH_SIZE = 1000
+
+
+class IngredientIndex:
+    """In-process sorted index of ingredient names.
+
+    Index is loaded from Ingredient table on first search
+    and reloaded when version of reference data is changed.
+    """
+
+    def __init__(self):
+        self._index = None
+        self._lock = Lock()
+
+    def get_index(self):
+        """Return pair of sorted lowercase names and ingredients."""
+        version = reference_data.get_version()
+        index = self._index
+        if index is None or index[0] != version:
+            with self._lock:
+                index = self._index
+                if index is None or index[0] != version:
+                    ingredients = sorted(
+                        Ingredient.objects.all(),
+                        key=lambda ingredient: (ingredient.name.lower(),
+                                                ingredient.id)
+                    )
+                    index = self._index = (
+                        version,
+                        [ingredient.name.lower()
+                         for ingredient in ingredients],
+                        ingredients,
+                    )
+        return index[1:]
+
+    def search(self, name, limit=None):
+        """Find ingredients which names start with or contain `name`.
+
+        Prefix matches go first, contains matches after them.
+        """
+        names, ingredients = self.get_index()
+        name = name.lower()
+        start = bisect_left(names, name)
+        end = bisect_left(names, name + '\uffff', lo=start)
+        found = ingredients[start:end]
+        if limit is not None and len(found) >= limit:
+            return found[:limit]
+        for position in (range(start), range(end, len(names))):
+            for index in position:
+                if name in names[index]:
+                    found.append(ingredients[index])
+                    if len(found) == limit:
+                        return found
+        return found
+
+
+ingredient_index = IngredientIndex()
+
+
+class PostgreSQLSearchBackend:
+    """Weighted tsvector documents in table with GIN index."""
+
+    id_column = 'recipe_id'
+
+    def install(self, cursor, table):
+        cursor.execute(
+            f'CREATE TABLE IF NOT EXISTS {table} ('
+            'recipe_id integer PRIMARY KEY, document tsvector NOT NULL)'
+        )
+        cursor.execute(
+            f'CREATE INDEX IF NOT EXISTS {table}_document_idx '
+            f'ON {table} USING gin (document)'
+        )
+
+    def insert(self, cursor, table, documents):
+        config = settings.RECIPE_SEARCH_CONFIG
+        cursor.executemany(
+            f'INSERT INTO {table} (recipe_id, document) VALUES (%s, '
+            "setweight(to_tsvector(%s::regconfig, %s), 'A') || "
+            "setweight(to_tsvector(%s::regconfig, %s), 'B') || "
+            "setweight(to_tsvector(%s::regconfig, %s), 'C'))",
+            [
+                (pk, config, name, config, ingredients, config, text)
+                for pk, name, ingredients, text in documents
+            ]
+        )
+
+    def get_query(self, words):
+        """Get tsquery matching prefixes of all words."""
+        return (
+            'to_tsquery(%s::regconfig, %s)',
+            [
+                settings.RECIPE_SEARCH_CONFIG,
+                ' & '.join(f'{word}:*' for word in words),
+            ],
+        )
+
+    def get_match(self, table, words):
+        query, params = self.get_query(words)
+        return f'{table}.document @@ {query}', params
+
+    def get_rank(self, table, words):
+        query, params = self.get_query(words)
+        return f'ts_rank({table}.document, {query})', params
+
+
+class SQLiteSearchBackend:
+    """FTS5 virtual table ranked by bm25, words are matched by prefix
+    as there is no stemming for Russian.
+    """
+
+    id_column = 'rowid'
+    weights = (10.0, 5.0, 1.0)
+
+    def install(self, cursor, table):
+        cursor.execute(
+            f'CREATE VIRTUAL TABLE IF NOT EXISTS {table} USING fts5('
+            'name, ingredients, text, '
+            "tokenize='unicode61 remove_diacritics 2')"
+        )
+
+    def insert(self, cursor, table, documents):
+        cursor.executemany(
+            f'INSERT INTO {table} (rowid, name, ingredients, text) '
+            'VALUES (%s, %s, %s, %s)',
+            documents
+        )
+
+    def get_query(self, words):
+        return ' '.join(f'"{word}"*' for word in words)
+
+    def get_match(self, table, words):
+        return f'{table} MATCH %s', [self.get_query(words)]
+
+    def get_rank(self, table, words):
+        weights = ', '.join(str(weight) for weight in self.weights)
+        return f'-bm25({table}, {weights})', []
+
+
+class RecipeSearch:
+    """Full-text index of names, ingredient names and texts of recipes.
+
+    Index is kept in separate table, which is created after migrations
+    and updated by application code when recipes are saved.
+    """
+
+    table = 'api_recipe_search'
+    backends = {
+        'postgresql': PostgreSQLSearchBackend(),
+        'sqlite': SQLiteSearchBackend(),
+    }
+    words = re.compile(r'\w+')
+
+    def normalize(self, text):
+        """Replace letter ё, which is often typed as е."""
+        return text.replace('ё', 'е').replace('Ё', 'Е')
+
+    def get_backend(self):
+        try:
+            return self.backends[connection.vendor]
+        except KeyError:
+            raise NotSupportedError(
+                f'Recipe search does not support {connection.vendor}.'
+            )
+
+    def install(self):
+        """Create index table if database supports it."""
+        if connection.vendor in self.backends:
+            with connection.cursor() as cursor:
+                self.get_backend().install(cursor, self.table)
+
+    def get_documents(self, ids):
+        """Get `(id, name, ingredient names, text)` of recipes."""
+        ingredients = {}
+        for recipe_id, name in RecipeIngredient.objects.filter(
+            recipe__in=ids
+        ).order_by('ingredients__name').values_list(
+            'recipe', 'ingredients__name'
+        ):
+            ingredients.setdefault(recipe_id, []).append(name)
+        return [
+            (
+                pk,
+                self.normalize(name),
+                self.normalize(' '.join(ingredients.get(pk, ()))),
+                self.normalize(text),
+            )
+            for pk, name, text in Recipe.objects.filter(
+                pk__in=ids
+            ).values_list('pk', 'name', 'text')
+        ]
+
+    def delete_documents(self, ids):
+        if not ids:
+            return
+        backend = self.get_backend()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {self.table} WHERE {backend.id_column} '
+                f'IN ({", ".join(["%s"] * len(ids))})',
+                ids
+            )
+
+    def remove_recipes(self, ids):
+        """Remove documents of recipes and make search responses stale."""
+        self.delete_documents(list(ids))
+        recipe_responses.invalidate('search')
+
+    def index_recipes(self, ids):
+        """Replace documents of recipes and make search responses stale."""
+        ids = list(ids)
+        for start in range(0, len(ids), BATCH_SIZE):
+            batch = ids[start:start + BATCH_SIZE]
+            self.delete_documents(batch)
+            with connection.cursor() as cursor:
+                self.get_backend().insert(
+                    cursor, self.table, self.get_documents(batch)
+                )
+        recipe_responses.invalidate('search')
+
+    def rebuild(self):
+        """Create index table and index all recipes, return their number."""
+        self.install()
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table}')
+        ids = list(Recipe.objects.values_list('pk', flat=True))
+        self.index_recipes(ids)
+        return len(ids)
+
+    def get_words(self, query):
+        return self.words.findall(self.normalize(query.lower()))[
+            :settings.RECIPE_SEARCH_MAX_WORDS
+        ]
+
+    def filter(self, queryset, query):
+        """Filter recipes matching all words of query, ordered by rank.
+
+        Index table is joined once, so rank is computed in the same pass
+        as matching. Rank is selected as `search_rank`, ties are ordered
+        like recipes without search.
+        """
+        words = self.get_words(query)
+        if not words:
+            return queryset.none()
+        backend = self.get_backend()
+        column = (
+            f'{connection.ops.quote_name(Recipe._meta.db_table)}.'
+            f'{connection.ops.quote_name(Recipe._meta.pk.column)}'
+        )
+        match, match_params = backend.get_match(self.table, words)
+        rank, rank_params = backend.get_rank(self.table, words)
+        return queryset.extra(
+            select={'search_rank': rank},
+            select_params=rank_params,
+            tables=[self.table],
+            where=[f'{self.table}.{backend.id_column} = {column}', match],
+            params=match_params,
+        ).order_by('-search_rank', '-pub_date', '-id')
+
+
+recipe_search = RecipeSearch()
+
+
+def to_bitmap(ids):
+    """Get int with bits of given ids set."""
+    ids = list(ids)
+    if not ids:
+        return 0
+    data = bytearray(max(ids) // 8 + 1)
+    for pk in ids:
+        data[pk >> 3] |= 1 << (pk & 7)
+    return int.from_bytes(data, 'little')
+
+
+def add_to_counters(counters, bitmap, start=0):
+    """Add one to bit-sliced counters of bits of bitmap multiplied
+    by `2 ** start`, i-th counter keeps i-th bits of all counts.
+    """
+    counters.extend([0] * (start - len(counters)))
+    carry = bitmap
+    for index in range(start, len(counters)):
+        if not carry:
+            return
+        counters[index], carry = (
+            counters[index] ^ carry, counters[index] & carry
+        )
+    if carry:
+        counters.append(carry)
+
+
+class RecipeIngredientIndex:
+    """In-process inverted index of ingredients of recipes.
+
+    Ingredient used by at least every DENSE_RATIO-th recipe keeps ids
+    of its recipes as bitmap in int, others keep them in sorted array.
+    Numbers of matched ingredients of all recipes are added up
+    by bitwise operations on whole bitmaps at once.
+
+    Changed recipes are journaled in RECIPE_INGREDIENT_INDEX_CACHE without
+    timeout, so every process reloads only them, or whole index if journal
+    entries are lost or there are more than RECIPE_INGREDIENT_INDEX_JOURNAL
+    of them. Older entries are deleted, so journal never fills the cache.
+    """
+
+    prefix = 'recipe_ingredient_index'
+    DENSE_RATIO = 256
+
+    def __init__(self):
+        self._index = None
+        self._lock = Lock()
+        self._scheduled = local()
+
+    @property
+    def cache(self):
+        return caches[settings.RECIPE_INGREDIENT_INDEX_CACHE]
+
+    def get_version(self):
+        key = f'{self.prefix}:version'
+        version = self.cache.get(key)
+        if version is None:
+            self.cache.add(key, time.time_ns(), timeout=None)
+            version = self.cache.get(key)
+        return version
+
+    def get_change_key(self, version):
+        return f'{self.prefix}:change:{version}'
+
+    def record_changes(self, recipe_ids):
+        """Journal changed recipes under next version of index."""
+        self.get_version()
+        try:
+            version = self.cache.incr(f'{self.prefix}:version')
+        except ValueError:
+            return
+        self.cache.set(
+            self.get_change_key(version), list(recipe_ids), timeout=None
+        )
+        self.cache.delete(self.get_change_key(
+            version - settings.RECIPE_INGREDIENT_INDEX_JOURNAL
+        ))
+
+    def schedule_changes(self, recipe_ids):
+        """Journal changed recipes after current transaction is committed,
+        recipes changed by one transaction are journaled together.
+        """
+        connection = transaction.get_connection()
+        scheduled = getattr(self._scheduled, 'callback', None)
+        if connection.in_atomic_block and any(
+            callback is scheduled for _, callback in connection.run_on_commit
+        ):
+            scheduled.args[0].update(recipe_ids)
+            return
+        scheduled = partial(self.record_changes, set(recipe_ids))
+        self._scheduled.callback = scheduled
+        transaction.on_commit(scheduled)
+
+    def reset(self):
+        """Make every process reload whole index."""
+        self.cache.delete(f'{self.prefix}:version')
+
+    def get_rows(self, recipe_ids=None):
+        rows = RecipeIngredient.objects.order_by()
+        if recipe_ids is not None:
+            rows = rows.filter(recipe__in=recipe_ids)
+        return rows.values_list('recipe', 'ingredients').iterator()
+
+    def build(self):
+        """Get postings by ingredient ids, ingredients by recipe ids
+        and bitmaps of recipes by number of their ingredients.
+        """
+        postings = defaultdict(list)
+        recipes = defaultdict(list)
+        for recipe_id, ingredient_id in self.get_rows():
+            postings[ingredient_id].append(recipe_id)
+            recipes[recipe_id].append(ingredient_id)
+        size = max(recipes, default=0) + 1
+        sizes = defaultdict(list)
+        for recipe_id, ingredient_ids in recipes.items():
+            sizes[len(ingredient_ids)].append(recipe_id)
+        return (
+            {
+                pk: (
+                    to_bitmap(ids) if len(ids) * self.DENSE_RATIO >= size
+                    else array('l', sorted(ids))
+                )
+                for pk, ids in postings.items()
+            },
+            {pk: tuple(ids) for pk, ids in recipes.items()},
+            {length: to_bitmap(ids) for length, ids in sizes.items()},
+        )
+
+    def add_recipe(self, posting, recipe_id):
+        if isinstance(posting, int):
+            return posting | 1 << recipe_id
+        posting = array('l', posting or ())
+        insort(posting, recipe_id)
+        return posting
+
+    def remove_recipe(self, posting, recipe_id):
+        if isinstance(posting, int):
+            return posting & ~(1 << recipe_id)
+        posting = array('l', posting)
+        del posting[bisect_left(posting, recipe_id)]
+        return posting
+
+    def apply(self, postings, recipes, sizes, recipe_ids):
+        """Get copies of index with changed recipes reloaded,
+        changed postings are replaced, not modified.
+        """
+        postings, recipes, sizes = dict(postings), dict(recipes), dict(sizes)
+        changed = {}
+        for recipe_id, ingredient_id in self.get_rows(recipe_ids):
+            changed.setdefault(recipe_id, []).append(ingredient_id)
+        for recipe_id in recipe_ids:
+            ingredient_ids = recipes.pop(recipe_id, ())
+            for pk in ingredient_ids:
+                postings[pk] = self.remove_recipe(postings[pk], recipe_id)
+                if not postings[pk]:
+                    del postings[pk]
+            if ingredient_ids:
+                sizes[len(ingredient_ids)] = self.remove_recipe(
+                    sizes[len(ingredient_ids)], recipe_id
+                )
+            ingredient_ids = tuple(changed.get(recipe_id, ()))
+            if ingredient_ids:
+                recipes[recipe_id] = ingredient_ids
+                for pk in ingredient_ids:
+                    postings[pk] = self.add_recipe(
+                        postings.get(pk), recipe_id
+                    )
+                sizes[len(ingredient_ids)] = self.add_recipe(
+                    sizes.get(len(ingredient_ids), 0), recipe_id
+                )
+        return postings, recipes, sizes
+
+    def load(self, index, version):
+        """Apply journaled changes to loaded index or build it again."""
+        if (
+            index is not None
+            and 0 < version - index[0]
+            <= settings.RECIPE_INGREDIENT_INDEX_JOURNAL
+        ):
+            changes = self.cache.get_many([
+                self.get_change_key(number)
+                for number in range(index[0] + 1, version + 1)
+            ])
+            if len(changes) == version - index[0]:
+                return (version, *self.apply(
+                    *index[1:], set().union(*changes.values())
+                ))
+        return (version, *self.build())
+
+    def get_index(self):
+        version = self.get_version()
+        index = self._index
+        if index is None or index[0] != version:
+            with self._lock:
+                index = self._index
+                if index is None or index[0] != version:
+                    index = self._index = self.load(index, version)
+        return index[1:]
+
+    def count_matches(self, postings, ingredient_ids):
+        """Get bit-sliced counters of matched ingredients of recipes.
+
+        Bitmaps are added to counters as they are, recipes of sparse
+        postings are counted first and added grouped by their counts.
+        """
+        counters = []
+        sparse = Counter()
+        for pk in set(ingredient_ids):
+            posting = postings.get(pk)
+            if isinstance(posting, int):
+                add_to_counters(counters, posting)
+            elif posting:
+                sparse.update(posting)
+        by_count = defaultdict(list)
+        for recipe_id, count in sparse.items():
+            by_count[count].append(recipe_id)
+        for count, recipe_ids in by_count.items():
+            bitmap = to_bitmap(recipe_ids)
+            for shift in range(count.bit_length()):
+                if count >> shift & 1:
+                    add_to_counters(counters, bitmap, shift)
+        return counters
+
+    def find(self, ingredient_ids, limit):
+        """Find recipes with most of their ingredients among given ones.
+
+        Return number of recipes with any of given ingredients and
+        `(coverage, matched ingredients, recipe id)` of best `limit`
+        recipes, where coverage is share of ingredients of recipe
+        which are given. Recipes are taken from bitmaps of every pair
+        of matched and total numbers of ingredients by descending
+        coverage, newer recipes go first.
+        """
+        postings, _, sizes = self.get_index()
+        counters = self.count_matches(postings, ingredient_ids)
+        matched_any = 0
+        for counter in counters:
+            matched_any |= counter
+        pairs = sorted(
+            (
+                (matched / total, matched, total)
+                for total in sizes
+                for matched in range(1, min(total, 2 ** len(counters) - 1) + 1)
+            ),
+            reverse=True
+        )
+        found = []
+        equal = {}
+        for coverage, matched, total in pairs:
+            if len(found) == limit:
+                break
+            if matched not in equal:
+                bitmap = matched_any
+                for index, counter in enumerate(counters):
+                    bitmap &= counter if matched >> index & 1 else ~counter
+                equal[matched] = bitmap
+            bitmap = equal[matched] & sizes[total]
+            while bitmap and len(found) < limit:
+                recipe_id = bitmap.bit_length() - 1
+                found.append((coverage, matched, recipe_id))
+                bitmap ^= 1 << recipe_id
+        return bin(matched_any).count('1'), found
+
+
+recipe_ingredient_index = RecipeIngredientIndex()
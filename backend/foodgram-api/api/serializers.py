@@ -1,9 +1,14 @@
-from api.fields import Base64ImageField
+from api import shopping_lists
+from api.fields import Base64ImageField, ImageVariantsField
+from api.memberships import memberships
 from api.models import (FavoriteRecipe, Ingredient, Recipe, RecipeIngredient,
                         RecipeInShoppingCart, Tag)
+from api.search import recipe_ingredient_index, recipe_search
+from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
 from django.shortcuts import get_object_or_404
 from rest_framework import exceptions, permissions, serializers
-from users.models import Follow, User
+from users.models import User
 
 
 class TagSerializer(serializers.ModelSerializer):
@@ -60,10 +65,9 @@ class UserInfoSerializer(serializers.ModelSerializer):
         user = self.context.get('request').user
         if not user.is_authenticated:
             return False
-        return Follow.objects.filter(
-            user=user,
-            following_id=obj.id
-        ).exists()
+        if hasattr(obj, 'subscribed'):
+            return obj.subscribed
+        return obj.id in memberships.get_ids(user, 'follows')
 
 
 class GetRecipeSerializer(serializers.ModelSerializer):
@@ -77,10 +81,11 @@ class GetRecipeSerializer(serializers.ModelSerializer):
     )
     tags = TagSerializer(many=True, required=True)
     image = Base64ImageField()
+    image_variants = ImageVariantsField()
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
     perimisson_classes = (permissions.AllowAny,)
-    favorites_count = serializers.SerializerMethodField()
+    favorites_count = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = Recipe
@@ -93,6 +98,7 @@ class GetRecipeSerializer(serializers.ModelSerializer):
             'is_in_shopping_cart',
             'name',
             'image',
+            'image_variants',
             'text',
             'cooking_time',
             'pub_date',
@@ -106,10 +112,9 @@ class GetRecipeSerializer(serializers.ModelSerializer):
         user = self.context['request'].user
         if not user.is_authenticated:
             return False
-        return FavoriteRecipe.objects.filter(
-            user=user,
-            recipe_id=obj.id
-        ).exists()
+        if hasattr(obj, 'favorited'):
+            return obj.favorited
+        return obj.id in memberships.get_ids(user, 'favorites')
 
     def get_is_in_shopping_cart(self, obj):
         """Get is_in_shopping_cart field."""
@@ -118,16 +123,9 @@ class GetRecipeSerializer(serializers.ModelSerializer):
         user = self.context['request'].user
         if not user.is_authenticated:
             return False
-        return RecipeInShoppingCart.objects.filter(
-            user=user,
-            recipe_in_cart=obj.id
-        ).exists()
-
-    def get_favorites_count(self, obj):
-        """Get the number of additions of recipes to favorites."""
-        return FavoriteRecipe.objects.filter(
-            recipe=obj
-        ).count()
+        if hasattr(obj, 'in_shopping_cart'):
+            return obj.in_shopping_cart
+        return obj.id in memberships.get_ids(user, 'shopping_cart')
 
 
 class PostRecipeSerializer(serializers.ModelSerializer):
@@ -159,6 +157,16 @@ class PostRecipeSerializer(serializers.ModelSerializer):
         )
 
     def to_representation(self, instance):
+        prefetch_related_objects(
+            [instance],
+            'tags',
+            Prefetch(
+                'recipe_ingredients',
+                queryset=RecipeIngredient.objects.select_related(
+                    'ingredients'
+                )
+            ),
+        )
         serializer = GetRecipeSerializer(instance)
         return serializer.data
 
@@ -171,44 +179,88 @@ class PostRecipeSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError(
                 {"tags": "Нужен хотя бы один тег."}
             )
-        unique_ingredients_id = []
-        ingredients = self.initial_data.get('ingredients')
+        ingredients = data['ingredients']
+        ingredients_id = [
+            ingredient['ingredients']['id'] for ingredient in ingredients
+        ]
+        if len(set(ingredients_id)) != len(ingredients_id):
+            raise serializers.ValidationError(
+                'Ингредиент уже добавлен.'
+            )
+        existing_ingredients = Ingredient.objects.in_bulk(ingredients_id)
+        if len(existing_ingredients) != len(ingredients_id):
+            raise serializers.ValidationError(
+                'Такой ингредиент не существует.'
+            )
         for ingredient in ingredients:
-            if not Ingredient.objects.filter(pk=ingredient['id']):
-                raise serializers.ValidationError(
-                    'Такой ингредиент не существует.'
-                )
-            if ingredient['id'] in unique_ingredients_id:
-                raise serializers.ValidationError(
-                    'Ингредиент уже добавлен.'
-                )
-            unique_ingredients_id.append(ingredient['id'])
-            if int(ingredient.get('amount')) <= 0:
+            if ingredient['amount'] <= 0:
                 raise serializers.ValidationError(
                     'Количество ингредиента должно быть больше 0.'
                 )
+            ingredient['ingredients'] = existing_ingredients[
+                ingredient['ingredients']['id']
+            ]
         return data
 
+    @transaction.atomic
     def create(self, validated_data):
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('ingredients')
         recipe = Recipe.objects.create(**validated_data)
         recipe.tags.set(tags)
-        recipes_for_create = []
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe=recipe, **ingredient)
+            for ingredient in ingredients
+        )
+        recipe_search.index_recipes([recipe.pk])
+        recipe_ingredient_index.schedule_changes([recipe.pk])
+        return recipe
+
+    def update_ingredients(self, recipe, ingredients):
+        """Insert, update and delete only changed ingredients of recipe,
+        apply changed amounts to shopping lists with this recipe
+        and journal changed set of ingredients for inverted index.
+        """
+        changes = {}
+        current_ingredients = {
+            recipe_ingredient.ingredients_id: recipe_ingredient
+            for recipe_ingredient in recipe.recipe_ingredients.all()
+        }
+        ingredients_for_create = []
+        ingredients_for_update = []
         for ingredient in ingredients:
-            current_ingredient = get_object_or_404(
-                Ingredient, pk=ingredient.get('ingredients')['id']
+            recipe_ingredient = current_ingredients.pop(
+                ingredient['ingredients'].id, None
             )
-            recipes_for_create.append(
-                RecipeIngredient(
-                    recipe=recipe,
-                    ingredients=current_ingredient,
-                    amount=ingredient['amount']
+            if recipe_ingredient is None:
+                ingredients_for_create.append(
+                    RecipeIngredient(recipe=recipe, **ingredient)
+                )
+                changes[ingredient['ingredients'].id] = ingredient['amount']
+            elif recipe_ingredient.amount != ingredient['amount']:
+                changes[recipe_ingredient.ingredients_id] = (
+                    ingredient['amount'] - recipe_ingredient.amount
                 )
+                recipe_ingredient.amount = ingredient['amount']
+                ingredients_for_update.append(recipe_ingredient)
+        for recipe_ingredient in current_ingredients.values():
+            changes[recipe_ingredient.ingredients_id] = (
+                -recipe_ingredient.amount
             )
-        RecipeIngredient.objects.bulk_create(recipes_for_create)
-        return recipe
+        if current_ingredients:
+            RecipeIngredient.objects.filter(pk__in=[
+                recipe_ingredient.pk
+                for recipe_ingredient in current_ingredients.values()
+            ]).delete()
+        RecipeIngredient.objects.bulk_update(
+            ingredients_for_update, ('amount',)
+        )
+        RecipeIngredient.objects.bulk_create(ingredients_for_create)
+        shopping_lists.change_recipe(recipe.pk, changes)
+        if ingredients_for_create or current_ingredients:
+            recipe_ingredient_index.schedule_changes([recipe.pk])
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         instance.name = validated_data.get('name', instance.name)
         instance.image = validated_data.get('image', instance.image)
@@ -219,30 +271,20 @@ class PostRecipeSerializer(serializers.ModelSerializer):
         tags = validated_data.pop('tags')
         instance.tags.set(tags)
         ingredients = validated_data.pop('ingredients')
-        RecipeIngredient.objects.filter(recipe=instance).delete()
-        recipes_for_update = []
-        for ingredient in ingredients:
-            current_ingredient = get_object_or_404(
-                Ingredient, pk=ingredient.get('ingredients')['id']
-            )
-            recipes_for_update.append(
-                RecipeIngredient(
-                    recipe=instance,
-                    ingredients=current_ingredient,
-                    amount=ingredient['amount']
-                )
-            )
-        RecipeIngredient.objects.bulk_create(recipes_for_update)
+        self.update_ingredients(instance, ingredients)
         instance.save()
+        recipe_search.index_recipes([instance.pk])
         return instance
 
 
 class ShortInfoRecipe(serializers.ModelSerializer):
     """Serializer for short info about Recipe."""
 
+    image_variants = ImageVariantsField()
+
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time',)
+        fields = ('id', 'name', 'image', 'image_variants', 'cooking_time',)
 
 
 class FavoriteRecipeSerializer(serializers.ModelSerializer):
@@ -343,3 +385,24 @@ class RecipeInShoppingCartSerializer(serializers.ModelSerializer):
                 'Уже убрано из списка покупок.'
             )
         return recipe_in_cart.delete()
+
+
+class IdsSerializer(serializers.Serializer):
+    """Serializer for ids of batch request."""
+
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=100,
+    )
+
+
+class AvailableIngredientsSerializer(serializers.Serializer):
+    """Serializer for query params of search by available ingredients."""
+
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=100,
+    )
+    limit = serializers.IntegerField(min_value=1, max_value=100, default=6)
@@ -0,0 +1,103 @@
+from api.models import RecipeIngredient, RecipeInShoppingCart, ShoppingListItem
+from django.db.models import Case, F, IntegerField, Sum, Value, When
+
+BATCH_SIZE = 1000
+
+
+def get_amounts(recipe_ids):
+    """Get summed amounts of ingredients of recipes by ingredient ids."""
+    return dict(
+        RecipeIngredient.objects.filter(
+            recipe__in=recipe_ids
+        ).order_by().values('ingredients').annotate(
+            amount=Sum('amount')
+        ).values_list('ingredients', 'amount')
+    )
+
+
+def apply_changes(user_ids, changes):
+    """Add `{ingredient_id: amount}` changes to shopping lists of users.
+
+    Missing rows are inserted with zero amount, then all rows are changed
+    by one UPDATE, so concurrent changes are summed by database.
+    """
+    changes = {pk: amount for pk, amount in changes.items() if amount}
+    if not changes:
+        return
+    user_ids = list(user_ids)
+    ShoppingListItem.objects.bulk_create(
+        [
+            ShoppingListItem(user_id=user_id, ingredients_id=pk)
+            for user_id in user_ids
+            for pk in changes
+        ],
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True
+    )
+    items = ShoppingListItem.objects.filter(
+        user__in=user_ids, ingredients__in=list(changes)
+    )
+    items.update(amount=F('amount') + Case(
+        *(
+            When(ingredients=pk, then=Value(amount))
+            for pk, amount in changes.items()
+        ),
+        default=Value(0),
+        output_field=IntegerField()
+    ))
+    items.filter(amount__lte=0).delete()
+
+
+def add_recipes(user, recipe_ids):
+    """Add ingredients of recipes put into user's shopping cart."""
+    apply_changes([user.pk], get_amounts(recipe_ids))
+
+
+def remove_recipes(user, recipe_ids):
+    """Subtract ingredients of recipes removed from user's shopping cart."""
+    apply_changes([user.pk], {
+        pk: -amount for pk, amount in get_amounts(recipe_ids).items()
+    })
+
+
+def change_recipe(recipe_id, changes):
+    """Apply changes of recipe ingredients to lists of users
+    having this recipe in shopping cart.
+    """
+    if not any(changes.values()):
+        return
+    apply_changes(
+        RecipeInShoppingCart.objects.filter(
+            recipe_in_cart=recipe_id
+        ).values_list('user', flat=True),
+        changes
+    )
+
+
+def rebuild(user_ids=None):
+    """Recount shopping lists of users or of everyone from their carts."""
+    if user_ids is None:
+        items = ShoppingListItem.objects.all()
+        ingredients = RecipeIngredient.objects.filter(
+            recipe__in_cart__isnull=False
+        )
+    else:
+        items = ShoppingListItem.objects.filter(user__in=user_ids)
+        ingredients = RecipeIngredient.objects.filter(
+            recipe__in_cart__user__in=user_ids
+        )
+    items.delete()
+    return len(ShoppingListItem.objects.bulk_create(
+        [
+            ShoppingListItem(
+                user_id=user_id, ingredients_id=ingredient_id, amount=amount
+            )
+            for user_id, ingredient_id, amount in ingredients.order_by(
+            ).values(
+                'recipe__in_cart__user', 'ingredients'
+            ).annotate(
+                amount=Sum('amount')
+            ).values_list('recipe__in_cart__user', 'ingredients', 'amount')
+        ],
+        batch_size=BATCH_SIZE
+    ))
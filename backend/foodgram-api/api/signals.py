@@ -0,0 +1,129 @@
+from api import shopping_lists
+from api.cache import recipe_responses, reference_data
+from api.images import schedule_variants
+from api.models import (FavoriteRecipe, Ingredient, Recipe, RecipeIngredient,
+                        RecipeTag, Tag)
+from api.search import recipe_ingredient_index, recipe_search
+from django.db.models.signals import (m2m_changed, post_delete, post_migrate,
+                                      post_save, pre_delete)
+from django.dispatch import receiver
+from users.models import User
+
+
+@receiver((post_save, post_delete), sender=Tag)
+@receiver((post_save, post_delete), sender=Ingredient)
+def bump_reference_data_version(sender, **kwargs):
+    """Make cached tags, ingredients, search index and recipes stale."""
+    reference_data.bump_version()
+
+
+@receiver(post_save, sender=Ingredient)
+def index_renamed_ingredient(sender, instance, created, **kwargs):
+    """Update search documents of recipes with changed ingredient."""
+    if not created:
+        recipe_search.index_recipes(
+            instance.in_recipe.values_list('recipe', flat=True)
+        )
+
+
+@receiver(post_migrate)
+def install_recipe_search(sender, **kwargs):
+    """Create recipe search index table after migrations of api."""
+    if sender.name == 'api':
+        recipe_search.install()
+
+
+@receiver(post_save, sender=Recipe)
+def make_image_variants(sender, instance, **kwargs):
+    """Make resized variants of new recipe image."""
+    schedule_variants(instance)
+
+
+@receiver(post_save, sender=Recipe)
+def invalidate_saved_recipe(sender, instance, created, **kwargs):
+    """Make stale cached responses with saved recipe."""
+    if created:
+        recipe_responses.invalidate('recipes', f'author:{instance.author_id}')
+    else:
+        recipe_responses.invalidate(f'recipe:{instance.pk}')
+
+
+@receiver(post_delete, sender=Recipe)
+def invalidate_deleted_recipe(sender, instance, **kwargs):
+    """Make stale cached responses with deleted recipe
+    and remove it from search index.
+    """
+    recipe_responses.invalidate(
+        'recipes', f'recipe:{instance.pk}', f'author:{instance.author_id}'
+    )
+    recipe_search.remove_recipes([instance.pk])
+
+
+@receiver(pre_delete, sender=Recipe)
+def remove_from_shopping_lists(sender, instance, **kwargs):
+    """Subtract ingredients of deleted recipe from shopping lists."""
+    shopping_lists.change_recipe(instance.pk, {
+        pk: -amount
+        for pk, amount in shopping_lists.get_amounts([instance.pk]).items()
+    })
+
+
+@receiver(m2m_changed, sender=RecipeTag)
+def invalidate_recipe_tags(sender, instance, action, reverse, pk_set,
+                           **kwargs):
+    """Make stale cached responses with recipe and its old and new tags."""
+    if reverse:
+        recipes, tags = pk_set, [instance.pk]
+    else:
+        recipes, tags = [instance.pk], pk_set
+    if action == 'pre_clear':
+        field = 'recipe' if reverse else 'tags'
+        related = RecipeTag.objects.filter(**{field: instance})
+        if reverse:
+            recipes = related.values_list('recipe', flat=True)
+        else:
+            tags = related.values_list('tags', flat=True)
+    elif action not in ('post_add', 'post_remove'):
+        return
+    recipe_responses.invalidate(
+        *(f'recipe:{pk}' for pk in recipes),
+        *(
+            f'tag:{slug}'
+            for slug in Tag.objects.filter(
+                pk__in=list(tags)
+            ).values_list('slug', flat=True)
+        )
+    )
+
+
+@receiver((post_save, post_delete), sender=RecipeTag)
+def invalidate_recipe_tag(sender, instance, **kwargs):
+    """Make stale cached responses with recipe and tag changed in admin."""
+    recipe_responses.invalidate(
+        f'recipe:{instance.recipe_id}', f'tag:{instance.tags.slug}'
+    )
+
+
+@receiver((post_save, post_delete), sender=RecipeIngredient)
+@receiver((post_save, post_delete), sender=FavoriteRecipe)
+def invalidate_recipe(sender, instance, **kwargs):
+    """Make stale cached responses with changed ingredients
+    or favorites count of recipe.
+    """
+    recipe_responses.invalidate(f'recipe:{instance.recipe_id}')
+
+
+@receiver(post_save, sender=User)
+def invalidate_author(sender, instance, update_fields, **kwargs):
+    """Make stale cached responses with changed author."""
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    recipe_responses.invalidate(f'author:{instance.pk}')
+
+
+@receiver((post_save, post_delete), sender=RecipeIngredient)
+def journal_recipe_ingredients(sender, instance, **kwargs):
+    """Journal recipe with ingredients changed in admin or deleted
+    with recipe or ingredient for inverted index, once per transaction.
+    """
+    recipe_ingredient_index.schedule_changes([instance.recipe_id])
@@ -1,4 +1,6 @@
-from api.views import (FavoriteRecipeViewSet, IngredientViewSet,
+from api.views import (FavoriteRecipeBatchViewSet, FavoriteRecipeViewSet,
+                       IngredientViewSet, MetricsViewSet,
+                       RecipeInShoppingCartBatchViewSet,
                        RecipeInShoppingCartViewSet, RecipeViewSet, TagViewSet)
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
@@ -16,6 +18,20 @@ urlpatterns = [
             'get': 'list'
         })
     ),
+    path('recipes/favorite/', FavoriteRecipeBatchViewSet.as_view({
+        'post': 'create',
+        'delete': 'destroy',
+    })),
+    path(
+        'recipes/shopping_cart/',
+        RecipeInShoppingCartBatchViewSet.as_view({
+            'post': 'create',
+            'delete': 'destroy',
+        })
+    ),
+    path('recipes/cook/', RecipeViewSet.as_view({'get': 'cook'})),
+    path('metrics/', MetricsViewSet.as_view({'get': 'list'})),
+    path('metrics/profiles/', MetricsViewSet.as_view({'get': 'profiles'})),
     path('', include(router.urls)),
     path('recipes/<int:recipe_id>/favorite/', FavoriteRecipeViewSet.as_view({
         'post': 'create',
@@ -1,54 +1,331 @@
-import tempfile
-
+from api import shopping_lists
+from api.cache import recipe_responses, reference_data
 from api.filters import IngredientSearchFilter, RecipeFilter
+from api.memberships import memberships
+from api.metrics import measure, metrics, profiler
 from api.models import (FavoriteRecipe, Ingredient, Recipe,
-                        RecipeInShoppingCart, Tag)
-from api.paginations import StandardResultsSetPagination
-from api.serializers import (FavoriteRecipeSerializer, GetRecipeSerializer,
-                             IngredientSrializer, PostRecipeSerializer,
+                        RecipeInShoppingCart, ShoppingListItem, Tag)
+from api.paginations import CursorPaginationMixin, StandardResultsSetPagination
+from api.renderers import (FastJSONRenderer, ShoppingListCSVRenderer,
+                           ShoppingListJSONRenderer, ShoppingListTextRenderer)
+from api.representations import represent, represent_recipes
+from api.search import recipe_ingredient_index
+from api.serializers import (AvailableIngredientsSerializer,
+                             FavoriteRecipeSerializer, GetRecipeSerializer,
+                             IdsSerializer, IngredientSrializer,
+                             PostRecipeSerializer,
                              RecipeInShoppingCartSerializer, TagSerializer)
-from django.db.models import F, Sum
-from django.http import FileResponse
+from django.db import transaction
+from django.db.models import F
+from django.http import HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import permissions, response, status, viewsets
 from rest_framework.permissions import AllowAny
 from users.models import User
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class ReferenceDataViewSet(viewsets.ReadOnlyModelViewSet):
+    """Base ViewSet for rarely changed data.
+
+    Full list is served as cached JSON, responses carry ETag
+    and answer 304 to matching If-None-Match.
+    """
+
+    reference_data_name = None
+
+    def get_etag(self):
+        return reference_data.get_etag(self.reference_data_name)
+
+    def is_filtered(self):
+        return False
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs
+        )
+        if response.status_code == status.HTTP_200_OK:
+            response['ETag'] = self.get_etag()
+        return response
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method in ('GET', 'HEAD'):
+            not_modified = get_conditional_response(
+                request, etag=self.get_etag()
+            )
+            if not_modified is not None:
+                return not_modified
+        return super().dispatch(request, *args, **kwargs)
+
+    def get_list_data(self, objects):
+        with measure('serialize'):
+            return represent(
+                objects, self.get_serializer_class().Meta.fields
+            )
+
+    def list(self, request, *args, **kwargs):
+        if self.is_filtered():
+            return response.Response(self.get_list_data(
+                self.filter_queryset(self.get_queryset())
+            ))
+        return HttpResponse(
+            reference_data.get_json(
+                self.reference_data_name,
+                lambda: self.get_list_data(self.get_queryset())
+            ),
+            content_type='application/json'
+        )
+
+
+class TagViewSet(ReferenceDataViewSet):
     """ViewSet for Tag."""
 
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
+    reference_data_name = 'tags'
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(ReferenceDataViewSet):
     """ViewSet for Ingredient."""
 
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSrializer
     filter_backends = (IngredientSearchFilter,)
-    search_fields = ('^name',)
+    reference_data_name = 'ingredients'
+
+    def is_filtered(self):
+        return IngredientSearchFilter.search_param in self.request.GET
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(CursorPaginationMixin, viewsets.ModelViewSet):
     """ViewSet for Recipe."""
 
     queryset = Recipe.objects.all()
     pagination_class = StandardResultsSetPagination
+    cursor_ordering = ('-pub_date', '-id')
     permission_classes = (AllowAny,)
     http_method_names = ['get', 'post', 'patch', 'delete']
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
+    dependency_versions = None
+
+    def get_dependency_versions(self, dependencies):
+        """Get versions of dependencies of response, every one is read
+        once per request, before data depending on it is read.
+        """
+        if self.dependency_versions is None:
+            self.dependency_versions = {}
+        missing = set(dependencies) - self.dependency_versions.keys()
+        if missing:
+            self.dependency_versions.update(
+                recipe_responses.get_versions(missing)
+            )
+        return self.dependency_versions
+
+    def get_recipe_dependencies(self, recipes):
+        """Get dependencies of `(id, author id)` pairs of recipes."""
+        dependencies = set()
+        for pk, author_id in recipes:
+            dependencies.add(f'recipe:{pk}')
+            dependencies.add(f'author:{author_id}')
+        return dependencies
+
+    def get_public_payloads(self, ids):
+        """Get user independent payloads of recipes from cache,
+        missing ones are built from `.values()` rows and cached under
+        versions of their recipes and authors read before the rows.
+        """
+        keys = {
+            recipe_responses.get_payload_key(self.request, pk): pk
+            for pk in ids
+        }
+        payloads = {
+            keys[key]: payload
+            for key, payload in recipe_responses.get_many(list(keys)).items()
+        }
+        missing = [pk for pk in ids if pk not in payloads]
+        if missing:
+            known = self.dependency_versions or {}
+            unknown = [pk for pk in missing if f'recipe:{pk}' not in known]
+            if unknown:
+                self.get_dependency_versions(self.get_recipe_dependencies(
+                    Recipe.objects.filter(pk__in=unknown).values_list(
+                        'pk', 'author'
+                    )
+                ))
+            entries = {}
+            for pk, payload in represent_recipes(
+                missing, self.request
+            ).items():
+                payloads[pk] = payload
+                entries[recipe_responses.get_payload_key(
+                    self.request, pk
+                )] = (payload, self.get_detail_dependencies(payload))
+            recipe_responses.set_many(entries, self.dependency_versions)
+        return payloads
+
+    def get_recipes_data(self, ids):
+        """Merge public payloads of recipes with flags of current user
+        from cached membership sets.
+        """
+        with measure('serialize'):
+            payloads = self.get_public_payloads(ids)
+        ids = [pk for pk in ids if pk in payloads]
+        user = self.request.user
+        if not user.is_authenticated:
+            return [payloads[pk] for pk in ids]
+        favorites = memberships.get_ids(user, 'favorites')
+        in_shopping_cart = memberships.get_ids(user, 'shopping_cart')
+        subscriptions = memberships.get_ids(user, 'follows')
+        data = []
+        for pk in ids:
+            payload = payloads[pk]
+            author = payload['author']
+            data.append(dict(
+                payload,
+                author=dict(
+                    author, is_subscribed=author['id'] in subscriptions
+                ),
+                is_favorited=pk in favorites,
+                is_in_shopping_cart=pk in in_shopping_cart,
+            ))
+        return data
+
+    def get_list_response(self):
+        queryset = self.filter_queryset(self.get_queryset()).values(
+            'id', 'pub_date', 'author'
+        )
+        page = self.paginate_queryset(queryset)
+        recipes = list(queryset) if page is None else page
+        self.get_dependency_versions(self.get_recipe_dependencies(
+            (recipe['id'], recipe['author']) for recipe in recipes
+        ))
+        data = self.get_recipes_data([recipe['id'] for recipe in recipes])
+        if page is not None:
+            return self.get_paginated_response(data)
+        return response.Response(data)
+
+    def get_detail_response(self):
+        recipe = self.get_object()
+        self.get_dependency_versions(
+            self.get_recipe_dependencies([(recipe.pk, recipe.author_id)])
+        )
+        return response.Response(self.get_recipes_data([recipe.pk])[0])
 
     def get_serializer_class(self):
         if self.action in ('list', 'retrieve'):
             return GetRecipeSerializer
         return PostRecipeSerializer
 
+    def get_list_scope(self):
+        """Get recipes, authors, tags and search index which set
+        of recipes of list depends on.
+
+        Author is converted by `int` as lookup of `author_id` does,
+        so `?author=05` depends on `author:5`.
+        """
+        dependencies = {'recipes'}
+        params = self.request.query_params
+        author = params.get('author')
+        if params.get('tags') or author:
+            dependencies = {f'tag:{slug}' for slug in params.getlist('tags')}
+            if author:
+                try:
+                    dependencies.add(f'author:{int(author)}')
+                except ValueError:
+                    dependencies.add('recipes')
+        if params.get('search'):
+            dependencies.discard('recipes')
+            dependencies.add('search')
+        return dependencies
+
+    def get_list_dependencies(self, data):
+        """Get scope of list and recipes and authors of its page."""
+        results = data['results'] if isinstance(data, dict) else data
+        return self.get_list_scope() | self.get_recipe_dependencies(
+            (recipe['id'], recipe['author']['id']) for recipe in results
+        )
+
+    def get_detail_dependencies(self, data):
+        """Get recipe and author which recipe page depends on."""
+        return self.get_recipe_dependencies(
+            [(data['id'], data['author']['id'])]
+        )
+
+    def get_cached_response(self, get_response, get_dependencies, scope=()):
+        """Return cached JSON of response or render and cache it.
+
+        Versions of `scope` are read before response is built, versions
+        of recipes and authors are read by `get_response` right after
+        their ids, so response is cached under versions older than
+        data it was built from.
+        """
+        key = recipe_responses.get_key(self.request)
+        content = recipe_responses.get(key)
+        if content is None:
+            versions = self.get_dependency_versions(scope)
+            response = get_response()
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            content = FastJSONRenderer().render(response.data)
+            recipe_responses.set(
+                key, content, get_dependencies(response.data), versions
+            )
+        return HttpResponse(content, content_type='application/json')
+
+    def list(self, request, *args, **kwargs):
+        if request.user.is_authenticated:
+            return self.get_list_response()
+        return self.get_cached_response(
+            self.get_list_response,
+            self.get_list_dependencies,
+            self.get_list_scope()
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        if request.user.is_authenticated:
+            return self.get_detail_response()
+        return self.get_cached_response(
+            self.get_detail_response, self.get_detail_dependencies
+        )
+
+    def cook(self, request, *args, **kwargs):
+        """Find recipes which can be cooked from `?ingredients=` ids.
+
+        Recipes are ranked by coverage, share of their ingredients
+        which are available, and have it in `coverage` field.
+        """
+        serializer = AvailableIngredientsSerializer(
+            data=request.query_params
+        )
+        serializer.is_valid(raise_exception=True)
+        count, found = recipe_ingredient_index.find(
+            serializer.validated_data['ingredients'],
+            serializer.validated_data['limit']
+        )
+        coverages = {pk: coverage for coverage, _, pk in found}
+        return response.Response({
+            'count': count,
+            'results': [
+                dict(recipe, coverage=round(coverages[recipe['id']], 3))
+                for recipe in self.get_recipes_data(list(coverages))
+            ],
+        })
+
+    @transaction.atomic
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
+        User.objects.filter(pk=self.request.user.pk).update(
+            recipes_count=F('recipes_count') + 1
+        )
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        User.objects.filter(
+            pk=instance.author_id, recipes_count__gt=0
+        ).update(recipes_count=F('recipes_count') - 1)
+        instance.delete()
 
 
 class FavoriteRecipeViewSet(viewsets.ModelViewSet):
@@ -60,12 +337,18 @@ class FavoriteRecipeViewSet(viewsets.ModelViewSet):
     http_method_names = ('post', 'delete',)
     lookup_field = 'recipe_id'
 
+    @transaction.atomic
     def perform_create(self, serializer):
         recipe = get_object_or_404(Recipe, pk=self.kwargs.get('recipe_id'))
-        return serializer.save(
+        favorite_recipe = serializer.save(
             user=self.request.user,
             recipe=recipe
         )
+        Recipe.objects.filter(pk=recipe.pk).update(
+            favorites_count=F('favorites_count') + 1
+        )
+        memberships.add(self.request.user, 'favorites', recipe.pk)
+        return favorite_recipe
 
     def get_serializer_context(self):
         return {
@@ -79,7 +362,14 @@ class FavoriteRecipeViewSet(viewsets.ModelViewSet):
             pk=self.kwargs.get('recipe_id')
         )
         serializer = self.serializer_class
-        serializer.destroy(self, self.request.user, recipe.id)
+        with transaction.atomic():
+            deleted, _ = serializer.destroy(
+                self, self.request.user, recipe.id
+            )
+            Recipe.objects.filter(
+                pk=recipe.pk, favorites_count__gte=deleted
+            ).update(favorites_count=F('favorites_count') - deleted)
+        memberships.remove(self.request.user, 'favorites', recipe.pk)
         return response.Response(status=status.HTTP_204_NO_CONTENT)
 
 
@@ -93,16 +383,25 @@ class RecipeInShoppingCartViewSet(viewsets.ModelViewSet):
     queryset = RecipeInShoppingCart.objects.all()
     http_method_names = ('post', 'delete', 'get', )
     lookup_field = 'recipe_in_cart'
+    shopping_list_renderer_classes = (
+        ShoppingListTextRenderer,
+        ShoppingListCSVRenderer,
+        ShoppingListJSONRenderer,
+    )
 
     def perform_create(self, serializer):
         recipe = get_object_or_404(
             Recipe,
             pk=self.kwargs.get('recipe_in_cart')
         )
-        return serializer.save(
-            user=self.request.user,
-            recipe_in_cart=recipe
-        )
+        with transaction.atomic():
+            recipe_in_cart = serializer.save(
+                user=self.request.user,
+                recipe_in_cart=recipe
+            )
+            shopping_lists.add_recipes(self.request.user, [recipe.pk])
+        memberships.add(self.request.user, 'shopping_cart', recipe.pk)
+        return recipe_in_cart
 
     def destroy(self, request, *args, **kwargs):
         recipe = get_object_or_404(
@@ -110,41 +409,39 @@ class RecipeInShoppingCartViewSet(viewsets.ModelViewSet):
             pk=self.kwargs.get('recipe_in_cart')
         )
         serializer = self.serializer_class
-        serializer.destroy(self, self.request.user, recipe.id)
+        with transaction.atomic():
+            serializer.destroy(self, self.request.user, recipe.id)
+            shopping_lists.remove_recipes(self.request.user, [recipe.pk])
+        memberships.remove(self.request.user, 'shopping_cart', recipe.pk)
         return response.Response(status=status.HTTP_204_NO_CONTENT)
 
+    def get_renderers(self):
+        if self.action == 'list':
+            return [
+                renderer() for renderer in self.shopping_list_renderer_classes
+            ]
+        return super().get_renderers()
+
     def list(self, request, *args, **kwargs):
-        """Makes shopping list and send it to user."""
+        """Makes shopping list and streams it to user
+        in format from `?format=txt|csv|json`.
+        """
         user = get_object_or_404(User, pk=request.user.id)
-        recipes = RecipeInShoppingCart.objects.filter(
+        ingredients_for_recipes_in_cart = ShoppingListItem.objects.filter(
             user=user
-        ).values_list('recipe_in_cart')
-        ingredients_for_recipes_in_cart = Recipe.objects.filter(
-            pk__in=recipes
         ).values(
-            'ingredients__name', 'ingredients__measurement_unit',
-        ).annotate(
-            amount=Sum(F('ingredients__in_recipe__amount'))
+            'ingredients__name', 'ingredients__measurement_unit', 'amount'
         ).order_by('ingredients__name')
-        try:
-            with tempfile.NamedTemporaryFile(
-                mode='w',
-                encoding='utf-8',
-                delete=False,
-            ) as shopping_list:
-                for ingredient in ingredients_for_recipes_in_cart:
-                    shopping_list.write(
-                        f"{ingredient['ingredients__name']} "
-                        f"{ingredient['ingredients__measurement_unit']} --> "
-                        f"{ingredient['amount']}\n"
-                    )
-            return FileResponse(
-                open(shopping_list.name, mode='rb'),
-                as_attachment=True,
-                filename=f'{user.username}_shopping_list.txt'
-            )
-        finally:
-            shopping_list.close()
+        renderer = request.accepted_renderer
+        shopping_list = StreamingHttpResponse(
+            renderer.stream(ingredients_for_recipes_in_cart.iterator()),
+            content_type=f'{renderer.media_type}; charset={renderer.charset}'
+        )
+        shopping_list['Content-Disposition'] = (
+            'attachment; '
+            f'filename="{user.username}_shopping_list.{renderer.format}"'
+        )
+        return shopping_list
 
     def get_serializer_context(self):
         if self.action in ('list',):
@@ -155,3 +452,175 @@ class RecipeInShoppingCartViewSet(viewsets.ModelViewSet):
             'recipe_in_cart': self.kwargs['recipe_in_cart'],
             'request': self.request
         }
+
+
+class BatchMembershipViewSet(viewsets.ViewSet):
+    """Base ViewSet to add or remove many objects for user at once.
+
+    Takes `{"ids": [...]}`, applies all of them by one bulk insert
+    or delete and answers with result for every id. Insert and delete
+    return ids of rows they really changed, so side effects are applied
+    only to those, batch requests of one user wait for each other
+    on lock of user row, deleted rows are locked before delete.
+    """
+
+    permission_classes = (permissions.IsAuthenticated,)
+    model = None
+    field = None
+    target_model = None
+    membership = None
+    exists_message = None
+    absent_message = None
+
+    def get_ids(self):
+        serializer = IdsSerializer(data=self.request.data)
+        serializer.is_valid(raise_exception=True)
+        return list(dict.fromkeys(serializer.validated_data['ids']))
+
+    def get_errors(self, ids, exists):
+        """Get error messages for ids which can not be processed."""
+        targets = set(self.target_model.objects.filter(
+            pk__in=ids
+        ).values_list('pk', flat=True))
+        existing = set(self.model.objects.filter(
+            user=self.request.user, **{f'{self.field}__in': ids}
+        ).values_list(self.field, flat=True))
+        errors = {}
+        for pk in ids:
+            if pk not in targets:
+                errors[pk] = 'Не найдено.'
+            elif (pk in existing) == exists:
+                errors[pk] = (
+                    self.exists_message if exists else self.absent_message
+                )
+        return errors
+
+    def get_response(self, ids, errors, status_name):
+        return response.Response({'results': [
+            {'id': pk, 'status': 'error', 'detail': errors[pk]}
+            if pk in errors else {'id': pk, 'status': status_name}
+            for pk in ids
+        ]})
+
+    def lock_user(self):
+        """Lock row of user, so concurrent batch requests of user change
+        memberships one after another.
+        """
+        list(User.objects.select_for_update().filter(
+            pk=self.request.user.pk
+        ).values_list('pk', flat=True))
+
+    def get_memberships(self, ids):
+        return self.model.objects.filter(
+            user=self.request.user, **{f'{self.field}__in': ids}
+        )
+
+    def perform_add(self, ids):
+        """Insert memberships, return ids of really added targets."""
+        if not ids:
+            return []
+        existing = set(
+            self.get_memberships(ids).values_list(self.field, flat=True)
+        )
+        self.model.objects.bulk_create(
+            [
+                self.model(user=self.request.user, **{f'{self.field}_id': pk})
+                for pk in ids
+            ],
+            ignore_conflicts=True
+        )
+        added = set(
+            self.get_memberships(ids).values_list(self.field, flat=True)
+        ) - existing
+        memberships.add(self.request.user, self.membership, *ids)
+        return [pk for pk in ids if pk in added]
+
+    def perform_remove(self, ids):
+        """Delete memberships, return ids of really removed targets."""
+        if not ids:
+            return []
+        removed = list(self.get_memberships(ids).select_for_update(
+        ).values_list(self.field, flat=True))
+        self.get_memberships(removed).delete()
+        memberships.remove(self.request.user, self.membership, *ids)
+        return removed
+
+    @transaction.atomic
+    def create(self, request, *args, **kwargs):
+        ids = self.get_ids()
+        self.lock_user()
+        errors = self.get_errors(ids, exists=True)
+        self.perform_add([pk for pk in ids if pk not in errors])
+        return self.get_response(ids, errors, 'added')
+
+    @transaction.atomic
+    def destroy(self, request, *args, **kwargs):
+        ids = self.get_ids()
+        self.lock_user()
+        errors = self.get_errors(ids, exists=False)
+        self.perform_remove([pk for pk in ids if pk not in errors])
+        return self.get_response(ids, errors, 'removed')
+
+
+class FavoriteRecipeBatchViewSet(BatchMembershipViewSet):
+    """ViewSet for add/delete many recipes into favorites."""
+
+    model = FavoriteRecipe
+    field = 'recipe'
+    target_model = Recipe
+    membership = 'favorites'
+    exists_message = 'Уже добавлено избранное.'
+    absent_message = 'Уже убрано из избранного.'
+
+    def perform_add(self, ids):
+        added = super().perform_add(ids)
+        Recipe.objects.filter(pk__in=added).update(
+            favorites_count=F('favorites_count') + 1
+        )
+        recipe_responses.invalidate(*(f'recipe:{pk}' for pk in added))
+        return added
+
+    def perform_remove(self, ids):
+        removed = super().perform_remove(ids)
+        Recipe.objects.filter(pk__in=removed, favorites_count__gt=0).update(
+            favorites_count=F('favorites_count') - 1
+        )
+        return removed
+
+
+class RecipeInShoppingCartBatchViewSet(BatchMembershipViewSet):
+    """ViewSet for add/delete many recipes in shopping cart."""
+
+    model = RecipeInShoppingCart
+    field = 'recipe_in_cart'
+    target_model = Recipe
+    membership = 'shopping_cart'
+    exists_message = 'Уже добавлено в список покупок.'
+    absent_message = 'Уже убрано из списка покупок.'
+
+    def perform_add(self, ids):
+        added = super().perform_add(ids)
+        shopping_lists.add_recipes(self.request.user, added)
+        return added
+
+    def perform_remove(self, ids):
+        removed = super().perform_remove(ids)
+        shopping_lists.remove_recipes(self.request.user, removed)
+        return removed
+
+
+class MetricsViewSet(viewsets.ViewSet):
+    """Staff only metrics and slow request profiles of this process."""
+
+    permission_classes = (permissions.IsAdminUser,)
+
+    def list(self, request, *args, **kwargs):
+        """Histograms of requests by view in Prometheus text format."""
+        return HttpResponse(
+            metrics.render(),
+            content_type='text/plain; version=0.0.4; charset=utf-8'
+        )
+
+    def profiles(self, request, *args, **kwargs):
+        """Stats of last profiled slow requests."""
+        return response.Response(profiler.get_profiles())
@@ -49,6 +49,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.MetricsMiddleware',
+    'api.middleware.RepeatedQueriesMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -83,6 +85,15 @@ WSGI_APPLICATION = 'foodgram-api.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
+# Connections are kept by every worker thread for DB_CONN_MAX_AGE seconds
+# and checked before reuse if idle for DB_HEALTH_CHECK_IDLE seconds.
+# DB_POOL_MODE=pgbouncer is for PgBouncer in transaction pooling mode,
+# which does not support server-side cursors.
+DB_POOL_MODES = ('persistent', 'pgbouncer')
+DB_POOL_MODE = os.getenv('DB_POOL_MODE', default='persistent')
+DB_MAX_CONNECTIONS = int(os.getenv('DB_MAX_CONNECTIONS', default=100))
+DB_HEALTH_CHECK_IDLE = 30
+
 DATABASES = {
     'default': {
         'ENGINE': os.getenv('DB_ENGINE', default='django.db.backends.sqlite3'),
@@ -91,6 +102,11 @@ DATABASES = {
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', default=None),
         'HOST': os.getenv('DB_HOST', default=None),
         'PORT': os.getenv('DB_PORT', default=None),
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', default=60)),
+        'CONN_HEALTH_CHECKS': os.getenv(
+            'DB_CONN_HEALTH_CHECKS', default='True'
+        ) == 'True',
+        'DISABLE_SERVER_SIDE_CURSORS': DB_POOL_MODE == 'pgbouncer',
     }
 }
 
@@ -101,6 +117,111 @@ DATABASES = {
 #     }
 # }
 
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', default='foodgram-api'),
+    },
+    'tokens': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'tokens',
+    },
+    'recipe_ingredient_index': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'recipe_ingredient_index',
+        'TIMEOUT': None,
+        'OPTIONS': {'MAX_ENTRIES': 2000},
+    },
+}
+
+# Cache alias and timeout (in seconds) for tags and ingredients.
+# Use shared backend (memcached, redis) with several gunicorn workers,
+# local memory backend invalidates only its own process.
+REFERENCE_DATA_CACHE = os.getenv('REFERENCE_DATA_CACHE', default='default')
+REFERENCE_DATA_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Cache alias and timeout (in seconds) for recipe list and detail responses
+# of anonymous users, entries are invalidated by signals on changes.
+RECIPE_RESPONSE_CACHE = os.getenv('RECIPE_RESPONSE_CACHE', default='default')
+RECIPE_RESPONSE_CACHE_TIMEOUT = 60 * 10
+
+# Cache alias and timeout (in seconds) for ids of favorites, shopping cart
+# and follows of users, sets are updated in place by views, so several
+# gunicorn workers need shared backend to see changes of each other.
+MEMBERSHIP_CACHE = os.getenv('MEMBERSHIP_CACHE', default='default')
+MEMBERSHIP_CACHE_TIMEOUT = 60 * 60
+
+# Cache alias and timeout (in seconds) for users of auth tokens. Local
+# memory cache forgets tokens on logout only in its own process, others
+# accept them until timeout, set TOKEN_CACHE=default with shared backend
+# to forget them everywhere.
+TOKEN_CACHE = os.getenv('TOKEN_CACHE', default='tokens')
+TOKEN_CACHE_TIMEOUT = 60
+
+# Limits of uploaded images and resized variants made in background
+# by IMAGE_WORKERS threads, variants are fitted into square of given side.
+IMAGE_MAX_SIZE = 10 * 1024 * 1024
+IMAGE_MAX_PIXELS = 40 * 1000 * 1000
+IMAGE_VARIANTS = {
+    'thumbnail': 480,
+    'detail': 1280,
+}
+IMAGE_VARIANT_FORMAT = os.getenv('IMAGE_VARIANT_FORMAT', default='WEBP')
+IMAGE_VARIANT_QUALITY = 80
+IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS', default=2))
+
+# Buckets of histograms by view collected by api.middleware.MetricsMiddleware
+# and shown to staff at /api/metrics/ in Prometheus text format.
+METRICS_DURATION_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0
+)
+METRICS_QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+METRICS_SERVER_TIMING = os.getenv(
+    'METRICS_SERVER_TIMING', default='True'
+) == 'True'
+
+# Share of requests profiled by cProfile, stats of last PROFILE_KEEP
+# requests slower than PROFILE_MIN_DURATION seconds are shown to staff
+# at /api/metrics/profiles/.
+PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', default=0.01))
+PROFILE_MIN_DURATION = 0.5
+PROFILE_KEEP = 20
+PROFILE_LINES = 40
+
+# Statement run more than NPLUSONE_THRESHOLD times by one request is logged
+# with name of responsible method once in NPLUSONE_LOG_INTERVAL seconds,
+# with NPLUSONE_RAISE=True (in tests) api.queries.RepeatedQueryError
+# is raised instead.
+NPLUSONE_THRESHOLD = 5
+NPLUSONE_RAISE = os.getenv('NPLUSONE_RAISE', default='False') == 'True'
+NPLUSONE_LOG_INTERVAL = 60
+
+# Text search configuration of recipe search index on PostgreSQL and
+# maximum number of words of `search` query param taken into account.
+RECIPE_SEARCH_CONFIG = os.getenv('RECIPE_SEARCH_CONFIG', default='russian')
+RECIPE_SEARCH_MAX_WORDS = 10
+
+# Recipes changed since in-process index of ingredients of recipes was
+# loaded are journaled in RECIPE_INGREDIENT_INDEX_CACHE, up to this number
+# of changes is kept and applied to index, longer journal reloads whole
+# index. Version and journal must not be evicted, so local memory backend
+# needs MAX_ENTRIES above journal size, shared backend (set alias to
+# default with memcached or redis for several workers) must not be full.
+RECIPE_INGREDIENT_INDEX_CACHE = os.getenv(
+    'RECIPE_INGREDIENT_INDEX_CACHE', default='recipe_ingredient_index'
+)
+RECIPE_INGREDIENT_INDEX_JOURNAL = 1000
+
+# Gunicorn runtime profile, see gunicorn.conf.py. GUNICORN_WORKERS=0
+# derives number of workers from CPU count, but caches with local memory
+# backend are not shared by processes, so then one worker is started.
+GUNICORN_WORKER_CLASS = os.getenv('GUNICORN_WORKER_CLASS', default='gthread')
+GUNICORN_WORKERS = int(os.getenv('GUNICORN_WORKERS', default=0))
+GUNICORN_THREADS = int(os.getenv('GUNICORN_THREADS', default=4))
+
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
 
@@ -151,8 +272,12 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.AllowAny',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
-    ]
+        'users.authentication.CachedTokenAuthentication',
+    ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
 }
 
 EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
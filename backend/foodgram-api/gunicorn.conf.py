@@ -0,0 +1,24 @@
+import os
+
+import django
+from django.conf import settings
+from django.core.management import call_command
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram-api.settings')
+
+from api.checks import get_threads, get_workers  # noqa: E402
+
+bind = os.getenv('GUNICORN_BIND', default='0:8000')
+worker_class = settings.GUNICORN_WORKER_CLASS
+workers = get_workers()
+threads = get_threads()
+timeout = 30
+keepalive = 5
+max_requests = 2000
+max_requests_jitter = 200
+
+
+def on_starting(server):
+    """Do not start workers with settings unsafe for them."""
+    django.setup()
+    call_command('check', deploy=True, tags=['runtime'])
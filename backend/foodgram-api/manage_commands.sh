@@ -3,6 +3,10 @@
 python3 manage.py makemigrations api
 python3 manage.py makemigrations users
 python3 manage.py migrate
+python3 manage.py update_counters
+python3 manage.py make_image_variants
+python3 manage.py rebuild_shopping_lists
+python3 manage.py rebuild_recipe_search
 python3 manage.py collectstatic --no-input
 python3 manage.py import_ingredients --write_json
 python3 manage.py import_ingredients --read
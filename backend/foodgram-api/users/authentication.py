@@ -0,0 +1,41 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework.authentication import TokenAuthentication
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Token authentication with user of token cached
+    for TOKEN_CACHE_TIMEOUT seconds.
+
+    Entries are deleted by signals when token is deleted on logout
+    and when user is changed, e.g. on password change or deactivation.
+    Backend is chosen by TOKEN_CACHE alias.
+    """
+
+    @staticmethod
+    def get_cache():
+        return caches[settings.TOKEN_CACHE]
+
+    @staticmethod
+    def get_cache_key(key):
+        return f'token:{hashlib.sha256(key.encode()).hexdigest()}'
+
+    def authenticate_credentials(self, key):
+        cache = self.get_cache()
+        cache_key = self.get_cache_key(key)
+        credentials = cache.get(cache_key)
+        if credentials is None:
+            credentials = super().authenticate_credentials(key)
+            cache.set(
+                cache_key, credentials, timeout=settings.TOKEN_CACHE_TIMEOUT
+            )
+        return credentials
+
+    @classmethod
+    def forget(cls, *keys):
+        """Delete cached users of tokens after transaction is committed."""
+        cache_keys = [cls.get_cache_key(key) for key in keys]
+        transaction.on_commit(lambda: cls.get_cache().delete_many(cache_keys))
@@ -52,6 +52,7 @@ class User(AbstractUser):
         blank=True,
         null=True
     )
+    recipes_count = models.PositiveIntegerField(default=0, editable=False)
 
     class Meta:
         ordering = ('-id',)
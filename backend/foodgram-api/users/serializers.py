@@ -1,3 +1,4 @@
+from api.memberships import memberships
 from api.paginations import StandardResultsSetPagination
 from api.serializers import ShortInfoRecipe, UserInfoSerializer
 from django.shortcuts import get_object_or_404
@@ -40,10 +41,7 @@ class UserRegistrationSerializer(UserSerializer):
         user = self.context.get('request').user
         if not user.is_authenticated:
             return False
-        return Follow.objects.filter(
-            user=user,
-            following_id=obj.id
-        ).exists()
+        return obj.id in memberships.get_ids(user, 'follows')
 
 
 class FollowSerializer(serializers.ModelSerializer):
@@ -125,7 +123,10 @@ class SubscriptionsSerializer(serializers.ModelSerializer):
         read_only=True
     )
     is_subscribed = serializers.SerializerMethodField()
-    recipes_count = serializers.SerializerMethodField()
+    recipes_count = serializers.IntegerField(
+        source='following.recipes_count',
+        read_only=True
+    )
 
     class Meta:
         model = Follow
@@ -140,10 +141,6 @@ class SubscriptionsSerializer(serializers.ModelSerializer):
             'recipes_count'
         )
 
-    def get_recipes_count(self, obj):
-        user = get_object_or_404(User, pk=obj.following.id)
-        return user.recipes.all().count()
-
     def get_is_subscribed(self, obj):
         if self.context:
             user = self.context.get('request').user
@@ -154,6 +151,8 @@ class SubscriptionsSerializer(serializers.ModelSerializer):
         return False
 
     def get_recipes(self, obj):
-        user = get_object_or_404(User, pk=obj.following.id)
-        serializer = ShortInfoRecipe(user.recipes.all(), many=True)
+        recipes = getattr(obj.following, 'short_recipes', None)
+        if recipes is None:
+            recipes = obj.following.recipes.all()
+        serializer = ShortInfoRecipe(recipes, many=True)
         return serializer.data
@@ -0,0 +1,21 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+from users.authentication import CachedTokenAuthentication
+from users.models import User
+
+
+@receiver(post_delete, sender=Token)
+def forget_deleted_token(sender, instance, **kwargs):
+    """Stop authenticating by token deleted on logout."""
+    CachedTokenAuthentication.forget(instance.key)
+
+
+@receiver(post_save, sender=User)
+def forget_user_tokens(sender, instance, update_fields, **kwargs):
+    """Reload user of tokens after password change or deactivation."""
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    CachedTokenAuthentication.forget(
+        *Token.objects.filter(user=instance).values_list('key', flat=True)
+    )
@@ -1,5 +1,10 @@
 from django.urls import include, path
-from users.views import SubscriptionsViewSet
+from rest_framework.routers import DefaultRouter
+from users.views import (SubscriptionsBatchViewSet, SubscriptionsViewSet,
+                         UserViewSet)
+
+router = DefaultRouter()
+router.register('users', UserViewSet)
 
 urlpatterns = [
     path(
@@ -10,6 +15,10 @@ urlpatterns = [
         'post': 'create',
         'delete': 'destroy'
     })),
-    path('', include('djoser.urls')),
+    path('users/subscribe/', SubscriptionsBatchViewSet.as_view({
+        'post': 'create',
+        'delete': 'destroy'
+    })),
+    path('', include(router.urls)),
     path('auth/', include('djoser.urls.authtoken')),
 ]
@@ -1,10 +1,20 @@
-from api.paginations import StandardResultsSetPagination
+from api.memberships import memberships
+from api.metrics import measure
+from api.models import Recipe
+from api.paginations import CursorPaginationMixin, StandardResultsSetPagination
+from api.views import BatchMembershipViewSet
+from django.db.models import OuterRef, Prefetch, Subquery
+from djoser import views
 from rest_framework import permissions, response, status, viewsets
-from users.models import Follow
+from users.models import Follow, User
 from users.serializers import FollowSerializer, SubscriptionsSerializer
 
 
-class SubscriptionsViewSet(viewsets.ModelViewSet):
+class UserViewSet(CursorPaginationMixin, views.UserViewSet):
+    """Djoser ViewSet for User with optional keyset pagination."""
+
+
+class SubscriptionsViewSet(CursorPaginationMixin, viewsets.ModelViewSet):
     """View to get list of follwings."""
 
     queryset = Follow.objects.all()
@@ -14,16 +24,51 @@ class SubscriptionsViewSet(viewsets.ModelViewSet):
     http_method_names = ('post', 'delete', 'get',)
     lookup_field = 'user_id'
 
+    def perform_create(self, serializer):
+        follow = serializer.save()
+        memberships.add(self.request.user, 'follows', follow.following_id)
+
     def destroy(self, request, user_id):
         serializer = self.serializer_class
         serializer.destroy(self, request.user, user_id)
+        memberships.remove(request.user, 'follows', user_id)
         return response.Response(status=status.HTTP_204_NO_CONTENT)
 
+    def get_recipes_limit(self):
+        """Get positive `recipes_limit` query param or None."""
+        try:
+            recipes_limit = int(self.request.query_params['recipes_limit'])
+        except (KeyError, ValueError):
+            return None
+        return recipes_limit if recipes_limit > 0 else None
+
+    def get_subscriptions(self):
+        """Follows of current user with authors
+        and their newest `recipes_limit` recipes fetched in fixed number
+        of queries.
+        """
+        recipes = Recipe.objects.all()
+        recipes_limit = self.get_recipes_limit()
+        if recipes_limit is not None:
+            recipes = recipes.filter(pk__in=Subquery(
+                Recipe.objects.filter(
+                    author=OuterRef('author')
+                ).values('pk')[:recipes_limit]
+            ))
+        return Follow.objects.filter(
+            user=self.request.user
+        ).select_related('following').prefetch_related(
+            Prefetch(
+                'following__recipes', queryset=recipes, to_attr='short_recipes'
+            )
+        )
+
     def list(self, request, *args, **kwargs):
-        follow = Follow.objects.filter(user=self.request.user)
+        follow = self.get_subscriptions()
         page = self.paginate_queryset(follow)
-        serializer = SubscriptionsSerializer(page, many=True)
-        return self.get_paginated_response(serializer.data)
+        with measure('serialize'):
+            data = SubscriptionsSerializer(page, many=True).data
+        return self.get_paginated_response(data)
 
     def get_serializer_context(self):
         if self.action in ('list',):
@@ -34,3 +79,22 @@ class SubscriptionsViewSet(viewsets.ModelViewSet):
             'user_id': self.kwargs['user_id'],
             'request': self.request
         }
+
+
+class SubscriptionsBatchViewSet(BatchMembershipViewSet):
+    """ViewSet for subscribe/unsubscribe to many users."""
+
+    model = Follow
+    field = 'following'
+    target_model = User
+    membership = 'follows'
+    exists_message = 'Вы уже подписаны.'
+    absent_message = 'Вы уже отписаны.'
+
+    def get_errors(self, ids, exists):
+        errors = super().get_errors(ids, exists)
+        if exists and self.request.user.pk in ids:
+            errors[self.request.user.pk] = (
+                'На самого себя подписаться нельзя.'
+            )
+        return errors
@@ -0,0 +1,90 @@
+import pytest
+from api.models import (FavoriteRecipe, Ingredient, Recipe, RecipeIngredient,
+                        RecipeInShoppingCart, Tag)
+from django.core.cache import caches
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from users.models import Follow, User
+
+
+@pytest.fixture(autouse=True)
+def clear_caches(settings):
+    """Start every test with empty caches, fail on repeated queries."""
+    settings.NPLUSONE_RAISE = True
+    for alias in settings.CACHES:
+        caches[alias].clear()
+    yield
+    for alias in settings.CACHES:
+        caches[alias].clear()
+
+
+@pytest.fixture
+def user(django_user_model):
+    return django_user_model.objects.create_user(
+        username='cook', email='cook@foodgram.io', password='Pa55word-cook',
+        first_name='Повар', last_name='Поварович',
+    )
+
+
+@pytest.fixture
+def user_client(user):
+    client = APIClient()
+    client.credentials(
+        HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=user).key}'
+    )
+    return client
+
+
+@pytest.fixture
+def create_recipes(user):
+    """Create recipes of several authors with tags and ingredients,
+    half of them are favorites, in cart and by followed authors of user.
+    """
+    def create_recipes(count):
+        start = Recipe.objects.count()
+        users, tag_count = User.objects.count(), Tag.objects.count()
+        ingredient_count = Ingredient.objects.count()
+        authors = [
+            User.objects.create(username=f'author{users + number}',
+                                email=f'author{users + number}@foodgram.io')
+            for number in range(3)
+        ]
+        Follow.objects.create(user=user, following=authors[0])
+        tags = [
+            Tag.objects.create(name=f'Тег {tag_count + number}',
+                               color=f'#{tag_count + number:06}',
+                               slug=f'tag{tag_count + number}')
+            for number in range(3)
+        ]
+        ingredients = [
+            Ingredient.objects.create(
+                name=f'Ингредиент {ingredient_count + number}',
+                measurement_unit='г'
+            )
+            for number in range(5)
+        ]
+        recipes = []
+        for number in range(count):
+            recipe = Recipe.objects.create(
+                author=authors[number % len(authors)],
+                name=f'Рецепт {start + number}',
+                image='recipes/image.png',
+                text='Описание',
+                cooking_time=number + 1,
+            )
+            recipe.tags.set(tags[:number % len(tags) + 1])
+            RecipeIngredient.objects.bulk_create(
+                RecipeIngredient(recipe=recipe, ingredients=ingredient,
+                                 amount=position + 1)
+                for position, ingredient in enumerate(
+                    ingredients[:number % len(ingredients) + 1]
+                )
+            )
+            if number % 2:
+                FavoriteRecipe.objects.create(user=user, recipe=recipe)
+                RecipeInShoppingCart.objects.create(
+                    user=user, recipe_in_cart=recipe
+                )
+            recipes.append(recipe)
+        return recipes
+    return create_recipes
@@ -0,0 +1,64 @@
+from unittest import mock
+
+import pytest
+from api.models import (FavoriteRecipe, Recipe, RecipeInShoppingCart,
+                        ShoppingListItem)
+from api.views import BatchMembershipViewSet
+
+
+@pytest.fixture
+def concurrent_request():
+    """Let rows changed by concurrent request after validation pass it."""
+    with mock.patch.object(
+        BatchMembershipViewSet, 'get_errors', return_value={}
+    ):
+        yield
+
+
+@pytest.mark.django_db
+def test_favorites_count_only_for_changed_rows(
+    user, user_client, create_recipes, concurrent_request
+):
+    recipes = create_recipes(4)
+    Recipe.objects.filter(in_favorites__user=user).update(favorites_count=1)
+    ids = [recipe.pk for recipe in recipes]
+    response = user_client.post(
+        '/api/recipes/favorite/', {'ids': ids}, format='json'
+    )
+    assert response.status_code == 200
+    assert set(Recipe.objects.values_list('favorites_count', flat=True)) == {1}
+    for _ in range(2):
+        user_client.delete(
+            '/api/recipes/favorite/', {'ids': ids}, format='json'
+        )
+    assert not FavoriteRecipe.objects.filter(user=user).exists()
+    assert set(Recipe.objects.values_list('favorites_count', flat=True)) == {0}
+
+
+@pytest.mark.django_db
+def test_shopping_list_only_for_changed_rows(
+    user, user_client, create_recipes, concurrent_request
+):
+    ids = [recipe.pk for recipe in create_recipes(4)]
+    RecipeInShoppingCart.objects.filter(user=user).delete()
+    ShoppingListItem.objects.filter(user=user).delete()
+    for _ in range(2):
+        user_client.post(
+            '/api/recipes/shopping_cart/', {'ids': ids}, format='json'
+        )
+    amounts = dict(ShoppingListItem.objects.filter(user=user).values_list(
+        'ingredients', 'amount'
+    ))
+    assert amounts
+    user_client.post('/api/recipes/shopping_cart/', {'ids': ids[:1]},
+                     format='json')
+    assert dict(ShoppingListItem.objects.filter(user=user).values_list(
+        'ingredients', 'amount'
+    )) == amounts
+    for _ in range(2):
+        user_client.delete(
+            '/api/recipes/shopping_cart/', {'ids': ids}, format='json'
+        )
+    assert not any(ShoppingListItem.objects.filter(user=user).values_list(
+        'amount', flat=True
+    ))
@@ -0,0 +1,50 @@
+import base64
+import struct
+import zlib
+from io import StringIO
+from unittest import mock
+
+import pytest
+from django.core.management import call_command
+
+
+def png_header(width, height):
+    """Get PNG which declares size but has no pixel data,
+    Pillow reads only header to open image.
+    """
+    def chunk(kind, data):
+        return (
+            struct.pack('>I', len(data)) + kind + data
+            + struct.pack('>I', zlib.crc32(kind + data))
+        )
+    return (
+        b'\x89PNG\r\n\x1a\n'
+        + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+        + chunk(b'IEND', b'')
+    )
+
+
+@pytest.mark.django_db
+def test_decompression_bomb_is_rejected(user_client):
+    image = base64.b64encode(png_header(15000, 15000)).decode()
+    response = user_client.post('/api/recipes/', {
+        'image': f'data:image/png;base64,{image}',
+        'name': 'Бомба',
+        'text': 'Описание',
+        'cooking_time': 1,
+    }, format='json')
+    assert response.status_code == 400
+    assert response.json()['image'] == [
+        'Слишком большое разрешение изображения.'
+    ]
+
+
+@pytest.mark.django_db
+def test_failed_variants_are_counted(create_recipes):
+    """Image files of created recipes do not exist."""
+    create_recipes(2)
+    output, errors = StringIO(), StringIO()
+    with mock.patch('api.images.connection'):
+        call_command('make_image_variants', stdout=output, stderr=errors)
+    assert 'с ошибками: 1' in output.getvalue()
+    assert 'recipes/image.png' in errors.getvalue()
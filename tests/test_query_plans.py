@@ -0,0 +1,47 @@
+from io import StringIO
+
+import pytest
+from api.management.commands.explain_filters import Command
+from api.models import FavoriteRecipe, RecipeInShoppingCart
+from api.search import recipe_search
+from django.core.management import CommandError, call_command
+from users.models import User
+
+
+@pytest.mark.parametrize('line, problem', [
+    ('Seq Scan on api_recipe  (cost=0.00..1.00 rows=1 width=4)', True),
+    ('Sort  (cost=1.00..1.00 rows=1 width=4)', True),
+    ('SCAN api_recipe', True),
+    ('SCAN TABLE api_favoriterecipe', True),
+    ('USE TEMP B-TREE FOR ORDER BY', True),
+    ('Index Scan using recipe_pub_date_idx on api_recipe', False),
+    ('SCAN api_recipe USING INDEX recipe_pub_date_idx', False),
+    ('SEARCH api_recipetag USING COVERING INDEX tag_recipe_idx', False),
+])
+def test_plan_problems(line, problem):
+    tables = ['api_recipe', 'api_favoriterecipe']
+    assert bool(Command().get_problems(line, tables, True)) is problem
+
+
+@pytest.mark.django_db
+def test_recipe_filters_use_indexes(user, create_recipes):
+    """Tables are larger than `min_rows`, favorites and cart
+    of every user are not, as with real data.
+    """
+    recipes = create_recipes(60)
+    for other in User.objects.exclude(pk=user.pk):
+        FavoriteRecipe.objects.bulk_create(
+            FavoriteRecipe(user=other, recipe=recipe)
+            for recipe in recipes[:20]
+        )
+        RecipeInShoppingCart.objects.bulk_create(
+            RecipeInShoppingCart(user=other, recipe_in_cart=recipe)
+            for recipe in recipes[:20]
+        )
+    recipe_search.rebuild()
+    output = StringIO()
+    try:
+        call_command('explain_filters', min_rows=40, stdout=output)
+    except CommandError:
+        pytest.fail(output.getvalue())
+    assert 'сортировка допустима' in output.getvalue()
@@ -0,0 +1,42 @@
+import pytest
+
+# Count, ids of page, recipes, their authors, tags and ingredients.
+ANONYMOUS_QUERIES = 6
+# Token and ids of favorites, cart and follows of user in addition.
+USER_QUERIES = ANONYMOUS_QUERIES + 4
+# Numbers of recipes and page sizes, smaller and larger than default.
+SIZES = [(2, 6), (40, 6), (40, 40), (60, 40)]
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('recipes_count, limit', SIZES)
+def test_recipe_list_queries_anonymous(
+    client, create_recipes, django_assert_num_queries, recipes_count, limit
+):
+    create_recipes(recipes_count)
+    url = f'/api/recipes/?limit={limit}'
+    with django_assert_num_queries(ANONYMOUS_QUERIES):
+        response = client.get(url)
+    assert response.status_code == 200
+    assert response.json()['count'] == recipes_count
+    assert len(response.json()['results']) == min(recipes_count, limit)
+    with django_assert_num_queries(0):
+        cached = client.get(url)
+    assert cached.content == response.content
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('recipes_count, limit', SIZES)
+def test_recipe_list_queries_authenticated(
+    user_client, create_recipes, django_assert_num_queries, recipes_count,
+    limit
+):
+    create_recipes(recipes_count)
+    with django_assert_num_queries(USER_QUERIES):
+        response = user_client.get(f'/api/recipes/?limit={limit}')
+    assert response.status_code == 200
+    results = response.json()['results']
+    assert len(results) == min(recipes_count, limit)
+    assert any(recipe['is_favorited'] for recipe in results)
+    assert any(recipe['is_in_shopping_cart'] for recipe in results)
+    assert any(recipe['author']['is_subscribed'] for recipe in results)
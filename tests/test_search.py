@@ -0,0 +1,22 @@
+import pytest
+from api.models import Recipe
+from api.search import recipe_search
+
+
+@pytest.mark.django_db
+def test_deleted_recipe_is_not_found(
+    client, create_recipes, django_capture_on_commit_callbacks
+):
+    """Deleted recipe and its author are not on cached first page,
+    so only dependency on search index makes the page stale.
+    """
+    recipes = [recipe for _ in range(12) for recipe in create_recipes(1)]
+    recipe_search.rebuild()
+    url = '/api/recipes/?search=Рецепт'
+    response = client.get(url).json()
+    assert response['count'] == 12
+    shown = {recipe['id'] for recipe in response['results']}
+    deleted = next(recipe for recipe in recipes if recipe.pk not in shown)
+    with django_capture_on_commit_callbacks(execute=True):
+        Recipe.objects.filter(pk=deleted.pk).delete()
+    assert client.get(url).json()['count'] == 11